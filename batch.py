@@ -0,0 +1,112 @@
+"""
+Othello evaluation of many positions at once with NumPy, for self-play and analysis jobs
+that score thousands of positions per call.  Positions are arrays of bitboards:
+
+    boards  - shape (N, 2) uint64, [white, black] for each position like engine's board
+    squares - shape (N, 64), 0 empty, 1 white, 2 black, with square y*8+x at y, x
+
+Every function works on whole arrays; the loops are over directions and distances, never
+over squares or positions.  engine.py doesn't need NumPy.  Set a Search's leafScores to
+leafScores here to have it score the last ply of its search a batch at a time.
+"""
+
+import numpy as np
+import engine
+
+# bits set in each byte value
+POPCOUNT8           = np.array([bin(value).count("1") for value in range(256)], np.uint8)
+# the engine's advantage table by square number
+ADVANTAGE           = np.array(engine.advantageSq, np.int32)
+# (shift, mask) for the 4 axes, as NumPy values so shifts stay uint64
+DIRECTIONS          = [(np.uint64(shift), np.uint64(mask)) for shift, mask in engine.DIRECTIONS]
+MAX_RUN             = 6 # the most pieces one direction of a move can capture
+COUNT_BITS          = 5 # bits for a move's capture count, which is at most 19
+PLANE_VALUES        = np.array([1 << j for j in range(COUNT_BITS)], np.uint8)
+
+# boards array from a list of [white, black] boards
+def toBoards(boards):
+    return np.array(boards, np.uint64).reshape(-1, 2)
+
+# boards array from a squares array
+def fromSquares(squares):
+    squares = np.asarray(squares).reshape(-1, 64)
+    boards = np.empty((len(squares), 2), np.uint64)
+    for i in range(2):
+        bits = np.packbits((squares == i + 1).astype(np.uint8), axis=1, bitorder="little")
+        boards[:, i] = bits.view("<u8")[:, 0]
+    return boards
+
+# squares array from a boards array
+def toSquares(boards):
+    bits = unpackBits(np.asarray(boards, np.uint64))
+    return (bits[:, 0] + 2 * bits[:, 1]).astype(np.int8)
+
+# bitboards of any shape to 0/1 uint8 with an extra last axis of 64 squares
+def unpackBits(bits):
+    data = np.ascontiguousarray(bits, "<u8")[..., None].view(np.uint8)
+    return np.unpackbits(data, axis=-1, bitorder="little")
+
+# number of bits set in each bitboard, same shape as bits
+def popCounts(bits):
+    data = np.ascontiguousarray(bits, "<u8")[..., None].view(np.uint8)
+    return POPCOUNT8[data].sum(axis=-1, dtype=np.int32)
+
+# (N, 2) [white, black] piece counts
+def discCounts(boards):
+    return popCounts(boards)
+
+# (N, 2) [white, black] sums of the advantage table over each colour's pieces
+def positionalScores(boards):
+    return unpackBits(boards).astype(np.int32) @ ADVANTAGE
+
+# engine.getMoves for arrays of own and other bitboards
+def moveBits(own, other):
+    empty = ~(own | other)
+    moves = np.zeros_like(own)
+    for shift, mask in DIRECTIONS:
+        inner = other & mask
+        for step in (lambda bits: bits << shift, lambda bits: bits >> shift):
+            flood = step(own) & inner
+            for i in range(MAX_RUN - 1):
+                flood |= step(flood) & inner
+            moves |= step(flood) & empty
+    return moves
+
+# (N, 2) [white, black] number of moves each colour could make
+def mobility(boards):
+    white, black = boards[:, 0], boards[:, 1]
+    return np.stack([popCounts(moveBits(white, black)), popCounts(moveBits(black, white))], axis=1)
+
+# (N, 64) pieces own would capture by playing on each square, 0 where it can't play.
+# For each direction a square captures k pieces if the k squares beyond it are other's
+# and the one after that is own's.  The counts are added up a bit at a time in
+# COUNT_BITS bitboards (bit planes) so only those need unpacking to squares
+def captureCounts(own, other):
+    empty = ~(own | other)
+    planes = [np.zeros_like(own) for j in range(COUNT_BITS)]
+    for shift, mask in DIRECTIONS:
+        inner = other & mask
+        # moving bits back towards the square the run starts from
+        for back in (lambda bits, n: bits >> (shift * np.uint64(n)), lambda bits, n: bits << (shift * np.uint64(n))):
+            run = empty
+            for k in range(1, MAX_RUN + 1):
+                run = run & back(inner, k)
+                if not run.any():
+                    break
+                ends = run & back(own, k + 1)
+                # add k at the ends, with a ripple carry through the planes
+                for j in range(COUNT_BITS):
+                    if k >> j & 1:
+                        carry = ends
+                        for plane in range(j, COUNT_BITS):
+                            planes[plane], carry = planes[plane] ^ carry, planes[plane] & carry
+    bits = unpackBits(np.stack(planes))
+    return np.tensordot(PLANE_VALUES, bits, axes=1).astype(np.int32)
+
+# the engine's 1 ply score for own to move: the best capture count plus advantage of any
+# move, or 0 with no move.  The same as Search.negamax at depth 1, for N positions
+def leafScores(own, other):
+    own, other = np.asarray(own, np.uint64), np.asarray(other, np.uint64)
+    counts = captureCounts(own, other)
+    scores = np.where(counts > 0, counts + ADVANTAGE, 0)
+    return scores.max(axis=1)
@@ -0,0 +1,245 @@
+"""
+Othello engine benchmark.  Runs perft (counts of every line of play to a fixed depth,
+passes included) from stored positions and checks them against known counts, times the
+AI search at each Breadth/Depth setting, times the core board functions and times how long
+short-lived processes take to start.  Prints the results as JSON so runs can be saved and
+compared from version to version:
+
+    python bench.py > before.json
+    python bench.py --breadths 5 --depths 4-8 --output after.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import engine
+
+# positions as move lists from the start, with the perft depth to run and the known
+# count at that depth.  The midgame counts were checked against the original Tile grid
+# version of the game
+PERFT_POSITIONS = [
+    ("start", "", 9, 3005288),
+    ("opening", "e6f6g6d6c6g7g8b6c4h8f7e3f2e7f5c3d3h5b2g5", 6, 670674),
+    ("midgame", "f5f4c3f6g3g4g5h6f3f2e3d3f7d2g1e7c1e2d1f8g6e1d8d6c7d7f1h2c2b8", 6, 720349),
+    ("late", "d3c5f6d2c4f3e6e3b5c6c7a6b3e7a5b4d1a2a4c2f7g5f5b7d7g7b2g6h5b6f8c1b1a3c8d8h6h4b8a7", 6, 353562),
+    ("passes", "e6d6c4d3c5b6b5f6f5f4e7b3e3f7c2b4g3d2g7f3e2c6g6c1f2d1a5a6a3f1a7f8g4a4b7a8b1a2g1b2b8g2e1g5h5h6g8c3", 8, 1213763),
+    ("endgame", "c4e3f6e6f7e7f4g8d2e2f3g4g2g3e1g1h1d3h4f5f2h2h3f1g5c6f8c5d8g7b7c1h6b5b3a2h8c7d6a7b4d7c2d1b8e8a5b6c3a3b1b2c8h5", 10, 178),
+]
+# positions the search is timed on
+SEARCH_POSITIONS = ["start", "opening", "midgame", "late"]
+# short-lived processes timed from start to exit, as (name, python -c code).  "python" is
+# the interpreter on its own, which the others are also given relative to
+STARTUP_CASES = [
+    ("python", "pass"),
+    ("import engine", "import engine"),
+    ("engine first move", "import engine; engine.bestMove(engine.Position(), 4)"),
+    ("pattern tables", "import pattern; pattern.PatternEval()"),
+    ("import book", "import book"),
+    ("import othello", "import othello"),
+    ("import server", "import server"),
+]
+
+# number of lines of play depth plies long from own to move.  A pass counts as a ply and
+# a finished game counts as 1 line however deep it was asked to go
+def perft(own, other, depth):
+    moves = engine.getMoves(own, other)
+    if not moves:
+        if not engine.getMoves(other, own):
+            return 1
+        return perft(other, own, depth - 1) if depth > 1 else 1
+    if depth == 1:
+        return engine.popCount(moves)
+    count = 0
+    while moves:
+        bit = moves & -moves
+        moves ^= bit
+        flips = engine.getFlips(bit.bit_length() - 1, own, other)
+        count += perft(other ^ flips, own | bit | flips, depth - 1)
+    return count
+
+# Position after a move list from the start
+def getPosition(moves):
+    position = engine.Position()
+    position.playMoves(moves)
+    return position
+
+# perft for each stored position up to maxDepth plies
+def runPerft(maxDepth):
+    results = []
+    for name, moves, depth, expected in PERFT_POSITIONS:
+        position = getPosition(moves)
+        i = engine.colourIndex(position.colour)
+        runDepth = min(depth, maxDepth)
+        startTime = time.time()
+        nodes = perft(position.board[i], position.board[1 - i], runDepth)
+        seconds = time.time() - startTime
+        # there's only a known count to check at the stored depth
+        if runDepth != depth:
+            expected = None
+        results.append({
+            "position": name,
+            "depth": runDepth,
+            "nodes": nodes,
+            "expected": expected,
+            "ok": expected is None or nodes == expected,
+            "seconds": round(seconds, 4),
+            "nodesPerSecond": int(nodes / seconds) if seconds else None,
+        })
+    return results
+
+# times Search.run on each search position at every breadth and depth.  Depth is the menu
+# value, so the search looks depth + 1 plies ahead
+def runSearch(breadths, depths, ttMb, workers):
+    results = []
+    positions = dict((p[0], getPosition(p[1])) for p in PERFT_POSITIONS)
+    for breadth in breadths:
+        for depth in depths:
+            for name in SEARCH_POSITIONS:
+                position = positions[name]
+                # a fresh table each time so every run does the same work
+                search = engine.Search(ttMb, workers)
+                startTime = time.time()
+                result = search.run(position.board, engine.colourIndex(position.colour), depth + 1, breadth)
+                seconds = time.time() - startTime
+                search.close()
+                results.append({
+                    "position": name,
+                    "breadth": breadth,
+                    "depth": depth,
+                    "move": engine.squareName(result[1] >> 3, result[1] & 7) if result else None,
+                    "score": result[0] if result else None,
+                    "nodes": search.nodes,
+                    "seconds": round(seconds, 4),
+                    "nodesPerSecond": int(search.nodes / seconds) if seconds else None,
+                    "ttHitRate": round(search.table.hitRate(), 4),
+                    "leaves": search.leaves,
+                    "cutoffs": search.cutoffs,
+                    "firstCutoffRate": round(search.firstCutoffRate(), 4),
+                    "iterations": search.iterations,
+                })
+    return results
+
+# calls per second for the core board functions, run over every legal move of the stored
+# positions
+def runFunctions(seconds):
+    cases = []
+    for name, moves, depth, expected in PERFT_POSITIONS:
+        position = getPosition(moves)
+        for y, x in position.legalMoves():
+            cases.append((position.board, position.colour, y, x))
+
+    # calls fn(case) over and over for about seconds and returns the calls per second
+    def _rate(fn):
+        calls, startTime = 0, time.time()
+        while True:
+            for case in cases:
+                fn(case)
+            calls += len(cases)
+            elapsed = time.time() - startTime
+            if elapsed >= seconds:
+                return int(calls / elapsed)
+
+    def _addRemove(case):
+        board, colour, y, x = case
+        board = list(board)
+        engine.removePiece(y, x, board, colour, engine.addPiece(y, x, board, colour))
+
+    def _scoreBoard(case):
+        board, colour, y, x = case
+        engine.scoreBoard(list(board), colour, engine.Move(), 0, 1, 5)
+
+    def _getMoves(case):
+        board, colour, y, x = case
+        i = engine.colourIndex(colour)
+        engine.getMoves(board[i], board[1 - i])
+
+    return {
+        "scoreTile": _rate(lambda case: engine.scoreTile(case[2], case[3], case[0], case[1])),
+        "addPiece+removePiece": _rate(_addRemove),
+        "getMoves": _rate(_getMoves),
+        "scoreBoard(depth 1, breadth 5)": _rate(_scoreBoard),
+    }
+
+# milliseconds each of the STARTUP_CASES takes in a new process, the median and the
+# fastest of runs, for how quickly batch jobs and pool workers get going.  The first run
+# of each isn't counted, so the OS file cache is warm as it is for every process after the
+# first
+def runStartup(runs):
+    results = []
+    base = None
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name, code in STARTUP_CASES:
+        times = []
+        for run in range(runs + 1):
+            startTime = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=here, check=True)
+            times.append((time.perf_counter() - startTime) * 1000)
+        median = statistics.median(times[1:])
+        if base is None:
+            base = median
+        results.append({
+            "case": name,
+            "ms": round(median, 2),
+            "fastestMs": round(min(times[1:]), 2),
+            "overPythonMs": round(median - base, 2),
+        })
+    return results
+
+# "3" or "2-5" to a list of ints
+def parseRange(text):
+    low, sep, high = text.partition("-")
+    return list(range(int(low), int(high or low) + 1))
+
+def main():
+    parser = argparse.ArgumentParser(description="Othello engine benchmark, output as JSON")
+    parser.add_argument("--perft-depth", type=int, default=99,
+                        help="most plies to run perft to (default: each position's stored depth)")
+    parser.add_argument("--breadths", type=parseRange, default=parseRange("0-5"),
+                        help="AI Breadth settings to time, like 5 or 0-5 (default 0-5)")
+    parser.add_argument("--depths", type=parseRange, default=parseRange("0-8"),
+                        help="AI Depth settings to time, like 4 or 0-8 (default 0-8)")
+    parser.add_argument("--tt-mb", type=int, default=16, help="transposition table MB per search (default 16)")
+    parser.add_argument("--workers", type=int, default=1, help="search processes (default 1)")
+    parser.add_argument("--function-seconds", type=float, default=1.0,
+                        help="time spent on each core function (default 1, 0 skips them)")
+    parser.add_argument("--startup-runs", type=int, default=10,
+                        help="times each startup case is run in a new process (default 10, 0 skips them)")
+    parser.add_argument("--skip-perft", action="store_true", help="don't run perft")
+    parser.add_argument("--skip-search", action="store_true", help="don't time the AI search")
+    parser.add_argument("--label", default=None, help="name for this run, saved in the output")
+    parser.add_argument("--output", default=None, help="file to write the JSON to (default stdout)")
+    options = parser.parse_args()
+
+    report = {
+        "label": options.label,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workers": options.workers,
+    }
+    if not options.skip_perft:
+        report["perft"] = runPerft(options.perft_depth)
+    if not options.skip_search:
+        report["search"] = runSearch(options.breadths, options.depths, options.tt_mb, options.workers)
+    if options.function_seconds > 0:
+        report["functions"] = runFunctions(options.function_seconds)
+    if options.startup_runs > 0:
+        report["startup"] = runStartup(options.startup_runs)
+
+    text = json.dumps(report, indent=1)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    # a wrong perft count means move generation is broken
+    if not all(result["ok"] for result in report.get("perft", [])):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Othello opening book.  The book is a file of fixed size records, (position key, best move,
+score, visit count), sorted by key.  Positions are stored in their canonical orientation
+(see engine.canonicalBoard) so the 8 mirror images of a position share 1 record.
+OpeningBook maps the file with mmap and binary searches it, so a book of any size opens
+instantly and only the pages a lookup touches are read.  Run this file to build a book, or
+to extend one, from self-play games and from game files that records.py reads, WTHOR .wtb
+or text with one game per line like "f5d6c3d3":
+
+    python book.py othello.book --self-play 200
+    python book.py othello.book --games games.txt --games WTH_2004.wtb --plies 16 --depth 6
+"""
+
+import os
+import mmap
+import struct
+import engine
+import records
+
+BOOK_MAGIC          = b"OTHBOOK2"
+BOOK_HEADER         = struct.Struct("<8sQ")   # magic, record count
+BOOK_RECORD         = struct.Struct("<QhIBx") # key, score, visits, square
+BOOK_DEFAULT_FILE   = "othello.book"
+BOOK_PLIES          = 16 # positions this many moves into a game or fewer go in the book
+BOOK_DEPTH          = 6 # plies the builder searches each book position to
+BOOK_RANDOMNESS     = 0.3 # chance of a random move at each ply of a self-play game
+
+# the position key the book is sorted on and the symmetry that takes board to the
+# orientation the record's move is for
+def bookKey(board, side):
+    return engine.canonicalKey(board, side)
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = None, 0
+        if len(self.data) >= BOOK_HEADER.size:
+            magic, self.count = BOOK_HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or BOOK_HEADER.size + self.count * BOOK_RECORD.size > len(self.data):
+            self.close()
+            raise ValueError("{} is not an opening book".format(path))
+        self.hits = 0
+        self.probes = 0
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return "{} positions, {} of {} lookups found".format(self.count, self.hits, self.probes)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    # (key, score, visits, square) of record i
+    def record(self, i):
+        return BOOK_RECORD.unpack_from(self.data, BOOK_HEADER.size + i * BOOK_RECORD.size)
+
+    # (square, score, visits) for key, or None if it isn't in the book
+    def lookup(self, key):
+        self.probes += 1
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) >> 1
+            midKey = struct.unpack_from("<Q", self.data, BOOK_HEADER.size + mid * BOOK_RECORD.size)[0]
+            if midKey < key:
+                low = mid + 1
+            elif midKey > key:
+                high = mid
+            else:
+                self.hits += 1
+                key, score, visits, sq = self.record(mid)
+                return sq, score, visits
+        return None
+
+    # (square, score, visits) for colour index side to move on board, or None
+    def probe(self, board, side):
+        key, t = bookKey(board, side)
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        sq, score, visits = entry
+        return engine.symmetrySq[engine.inverseSymmetry[t]][sq], score, visits
+
+    # every record, in key order
+    def records(self):
+        for i in range(self.count):
+            yield self.record(i)
+
+# writes {key: (score, visits, square)} to path as a book.  The file is written next to
+# path and renamed over it, so a book that is open somewhere else is never half written
+def writeBook(path, entries):
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(BOOK_HEADER.pack(BOOK_MAGIC, len(entries)))
+        for key in sorted(entries):
+            score, visits, sq = entries[key]
+            f.write(BOOK_RECORD.pack(key, score, visits, sq))
+    os.replace(temp, path)
+
+# {key: [score, visits, square]} from the book at path, or empty if there isn't one
+def readBook(path):
+    if not os.path.exists(path):
+        return {}
+    book = OpeningBook(path)
+    entries = dict((key, [score, visits, sq]) for key, score, visits, sq in book.records())
+    book.close()
+    return entries
+
+# count games, as lists of square numbers, of plies moves played by search at depth, with a
+# random move now and then so the games spread out over the openings
+def selfPlayGames(count, plies, depth, search, seed=None):
+    import random
+    rand = random.Random(seed)
+    for game in range(count):
+        position = engine.Position()
+        moves = []
+        while len(moves) < plies and not position.isGameOver():
+            legal = position.legalMoves()
+            if not legal:
+                position.passTurn()
+                continue
+            if rand.random() < BOOK_RANDOMNESS:
+                y, x = rand.choice(legal)
+            else:
+                move = engine.bestMove(position, depth, 5, search=search)
+                y, x = move.y, move.x
+            position.play(y, x)
+            moves.append(y * 8 + x)
+        yield moves
+
+# (board, side) of each position in the first plies moves of a game where the colour to
+# move has a move
+def gamePositions(moves, plies):
+    for board, side, sq, flips in records.replay(moves[:plies]):
+        yield board, side
+
+# adds the positions of games, lists of square numbers, to the book at path.  Positions
+# already in the book only have their visit count raised; new ones are searched to depth
+# for their move and score.  Returns the number of new positions
+def buildBook(path, games, plies, depth, search):
+    entries = readBook(path)
+    added = 0
+    for moves in games:
+        for board, side in gamePositions(moves, plies):
+            key, t = bookKey(board, side)
+            entry = entries.get(key)
+            if entry is None:
+                score, sq, flips = search.run(board, side, depth, 5)
+                entries[key] = [score, 1, engine.symmetrySq[t][sq]]
+                added += 1
+            else:
+                entry[1] += 1
+    writeBook(path, entries)
+    return added
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or extend an Othello opening book")
+    parser.add_argument("book", nargs="?", default=BOOK_DEFAULT_FILE,
+                        help="book file to create or extend (default {})".format(BOOK_DEFAULT_FILE))
+    parser.add_argument("--games", action="append", default=[],
+                        help="file of games, .wtb or one per line like f5d6c3d3 (can be given more than once)")
+    parser.add_argument("--self-play", type=int, default=0, help="number of self-play games to add")
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES,
+                        help="moves into each game to add to the book (default {})".format(BOOK_PLIES))
+    parser.add_argument("--depth", type=int, default=BOOK_DEPTH,
+                        help="plies to search each new position (default {})".format(BOOK_DEPTH))
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the self-play games")
+    parser.add_argument("--tt-mb", type=int, default=engine.TT_DEFAULT_MB, help="transposition table MB")
+    options = parser.parse_args()
+
+    search = engine.Search(options.tt_mb, endgameEmpties=0)
+    for path in options.games:
+        games = (game.moves for game in records.readGames(path))
+        added = buildBook(options.book, games, options.plies, options.depth, search)
+        print("{}: {} new positions".format(path, added))
+    if options.self_play:
+        games = selfPlayGames(options.self_play, options.plies, options.depth, search, options.seed)
+        added = buildBook(options.book, games, options.plies, options.depth, search)
+        print("self-play: {} new positions".format(added))
+    if not os.path.exists(options.book):
+        parser.error("{} doesn't exist yet, give --games or --self-play to build it".format(options.book))
+    book = OpeningBook(options.book)
+    print("{}: {} positions".format(options.book, len(book)))
+    book.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1442 @@
+"""
+Othello engine: the rules, board and AI search.
+Nothing in here uses curses, so batch jobs, tests and the AI worker processes can import
+it without a terminal.  othello.py is the curses game built on top of it.
+"""
+
+import mmap
+import time
+from array import array
+
+BLANK               = ' '
+WHITE               = 'O'
+BLACK               = 'X'
+
+# the board is 2 bitboards, [white, black], indexed the same way as score and status.
+# bit y*8+x is set when that colour has a piece on row y, column x
+FULL_BOARD          = 0xFFFFFFFFFFFFFFFF
+NOT_EDGE_COLS       = 0x7E7E7E7E7E7E7E7E # stops horizontal/diagonal traces wrapping rows
+START_WHITE         = 0x0000001008000000 # (3,3) and (4,4)
+START_BLACK         = 0x0000000810000000 # (3,4) and (4,3)
+# (shift, mask) for the 4 axes.  getMoves floods each both up (<<) and down (>>) the bits
+DIRECTIONS          = [(1, NOT_EDGE_COLS), (8, FULL_BOARD), (7, NOT_EDGE_COLS), (9, NOT_EDGE_COLS)]
+SCORE_INFINITE      = 1 << 20 # bigger than any score the search can return
+ASPIRATION_WINDOW   = 8 # +/- around the expected score before a search is re-done wide open
+PV_LENGTH           = 20 # most moves Search.analyse gives in a principal variation
+TT_DEFAULT_MB       = 64 # transposition table size if --tt-mb isn't given
+TT_EXACT            = 1 # transposition table score types
+TT_LOWER            = 2
+TT_UPPER            = 3
+NO_MOVE             = 64 # square number stored when there's no best move
+ZOBRIST_SEED        = 2017
+TIME_CHECK_NODES    = 1023 # how often (nodes - 1) the search looks at the clock
+NO_DEADLINE         = float("inf") # deadline for a search with no time limit that stop() can still end
+ORDER_DEPTH         = 5 # nodes with this many plies left or more use killers and history to order moves
+SHALLOW_ORDER_DEPTH = 10 # and from this many they order by a shallow search of each move,
+SHALLOW_ORDER_PLY   = 1 # as do ones up to this many plies from the root with ORDER_DEPTH left
+SHALLOW_ORDER_PLIES = 2 # how deep that shallow search is
+KILLER_BONUS        = 2 # added to the static score of a ply's first killer move, half to its second
+MAX_PLY             = 64 # killer move slots, 1 per ply from the root
+HISTORY_MAX         = 1 << 24 # history scores are halved when one gets past this
+# what put a move that caused a cutoff where it was in the order, for the stats
+CUT_HASH            = 0
+CUT_KILLER          = 1
+CUT_HISTORY         = 2
+CUT_STATIC          = 3
+CUT_SHALLOW         = 4
+CUT_NAMES           = ["hash", "killer", "history", "static", "shallow"]
+EVAL_DISC           = 16 # an evaluator's score for being 1 disc ahead (see pattern.py)
+ENDGAME_EMPTIES     = 12 # the AI plays perfectly from this many empty squares, if not told otherwise
+ENDGAME_TIME_SHARE  = 0.5 # of a timed search's time the solver can use, the rest is left for searching if it can't finish
+ENDGAME_DEPTH       = 63 # table depth that marks an exact endgame score
+ENDGAME_TT_EMPTIES  = 7 # endgame positions with fewer empty squares than this don't use the table
+ENDGAME_FASTEST     = 7 # from this many empty squares moves are ordered fastest-first, below by parity
+# the 4 quadrants of the board.  Parity ordering plays into quadrants with an odd number of
+# empty squares first, so that the last move in each one tends to be ours
+QUADRANTS           = [0x000000000F0F0F0F, 0x00000000F0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000]
+SYMMETRY_DEPTH      = 4 # nodes searched this many plies or more share table entries with their mirror images
+SYMMETRY_EMPTIES    = 10 # the same for the endgame solver, in empty squares
+
+# "backs" the board so that some squares are worth more than the tiles they capture
+advantage = [
+    [8, 0, 3, 2, 2, 3, 0, 8],
+    [0, 0, 2, 0, 0, 2, 0, 0],
+    [3, 2, 4, 3, 3, 4, 2, 3],
+    [2, 0, 3, 0, 0, 3, 0, 2],
+    [2, 0, 3, 0, 0, 3, 0, 2],
+    [3, 2, 4, 3, 3, 4, 2, 3],
+    [0, 0, 2, 0, 0, 2, 0, 0],
+    [8, 0, 3, 2, 2, 3, 0, 8],
+]
+# the same table indexed by bit number, for the bitboard code
+advantageSq = [advantage[sq >> 3][sq & 7] for sq in range(64)]
+
+# Zobrist keys: one random number per colour per square plus one for black to move.  A
+# position's key is all of those XOR'd together so a move can update it incrementally.
+# Returns zobrist, zobristTurn, zobristFlips and zobristBytes
+def makeZobristTables():
+    import random
+    rng = random.Random(ZOBRIST_SEED)
+    zobrist = [[rng.getrandbits(64) for sq in range(64)] for i in range(2)]
+    zobristTurn = rng.getrandbits(64)
+    # key changes for turning all the pieces in one byte of a flips bitboard, 1 table per byte
+    zobristFlips = []
+    for byte in range(8):
+        table = [0] * 256
+        for value in range(1, 256):
+            low = value & -value
+            sq = byte * 8 + low.bit_length() - 1
+            table[value] = table[value ^ low] ^ zobrist[0][sq] ^ zobrist[1][sq]
+        zobristFlips.append(table)
+    # Zobrist keys for all the pieces of one colour in one byte of a bitboard.
+    # zobristBytes[colour][byte][value] so boardKey is 16 lookups
+    zobristBytes = []
+    for i in range(2):
+        zobristBytes.append([])
+        for byte in range(8):
+            table = [0] * 256
+            for value in range(1, 256):
+                low = value & -value
+                table[value] = table[value ^ low] ^ zobrist[i][byte * 8 + low.bit_length() - 1]
+            zobristBytes[i].append(table)
+    return zobrist, zobristTurn, zobristFlips, zobristBytes
+
+zobrist, zobristTurn, zobristFlips, zobristBytes = makeZobristTables()
+
+# rays out from each square as bitboards, for the 8 directions.  raysUp[sq] are the
+# directions that go to higher bit numbers and raysDown[sq] the ones going lower.  Rays
+# shorter than 2 squares can never capture anything so they are left out
+raysUp = [[] for sq in range(64)]
+raysDown = [[] for sq in range(64)]
+for sq in range(64):
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            y, x, ray, length = (sq >> 3) + dy, (sq & 7) + dx, 0, 0
+            while (dy or dx) and 0 <= y < 8 and 0 <= x < 8:
+                ray |= 1 << (y * 8 + x)
+                y, x, length = y + dy, x + dx, length + 1
+            if length >= 2:
+                (raysUp if dy * 8 + dx > 0 else raysDown)[sq].append(ray)
+
+# the quadrant each square is in, as a bitboard
+quadrantOf = [QUADRANTS[(sq >> 5) * 2 + ((sq & 7) >> 2)] for sq in range(64)]
+
+# the 8 symmetries of the board.  Transform t flips a bitboard over the a1-h8 diagonal if
+# t & 4, then upside down if t & 2, then left to right if t & 1.  Upside down is a byte
+# swap and left to right reverses the bits in each byte, so both are done on the bytes
+reverseBits = bytes(int("{:08b}".format(value)[::-1], 2) for value in range(256))
+
+# bits flipped over the a1-h8 diagonal, so (y,x) goes to (x,y)
+def flipDiagonal(bits):
+    t = 0x0F0F0F0F00000000 & (bits ^ (bits << 28))
+    bits ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (bits ^ (bits << 14))
+    bits ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (bits ^ (bits << 7))
+    return bits ^ t ^ (t >> 7)
+
+# bitboard bits under symmetry t
+def transformBits(bits, t):
+    if t & 4:
+        bits = flipDiagonal(bits)
+    if t & 3:
+        data = bits.to_bytes(8, "little")
+        if t & 1:
+            data = data.translate(reverseBits)
+        bits = int.from_bytes(data, "big" if t & 2 else "little")
+    return bits
+
+# symmetrySq[t][sq] is where square sq goes under symmetry t, and inverseSymmetry[t] the
+# symmetry that brings it back.  NO_MOVE stays NO_MOVE
+symmetrySq = [[transformBits(1 << sq, t).bit_length() - 1 for sq in range(64)] + [NO_MOVE] for t in range(8)]
+inverseSymmetry = [[u for u in range(8) if all(symmetrySq[u][symmetrySq[t][sq]] == sq for sq in range(64))][0] for t in range(8)]
+
+# counts the bits set in a bitboard
+try:
+    popCount = int.bit_count
+except AttributeError:
+    def popCount(bits):
+        return bin(bits).count('1')
+
+# keeps track of x,y and potential score
+class Move:
+    y = x = -1
+    score = 0
+    line = ()
+    def __init__(self, y=-1, x=-1, s=0):
+        self.y = y
+        self.x = x
+        self.score = s
+    def __lt__(self, rhs):
+        return self.score < rhs.score
+    def __repr__(self):
+        return "({},{},{})".format(self.y, self.x, self.score)
+
+# simply turn black->white or white->black
+def swap(colourIn):
+    if colourIn == BLACK:
+        return WHITE
+    return BLACK
+
+# index of colour into board, score and status
+def colourIndex(colour):
+    if colour == WHITE:
+        return 0
+    return 1
+
+# what is on the board at row y, column x
+def contents(board, y, x):
+    bit = 1 << (y * 8 + x)
+    if board[0] & bit:
+        return WHITE
+    if board[1] & bit:
+        return BLACK
+    return BLANK
+
+# "f5" style name for row y, column x.  Columns are a-h and rows 1-8
+def squareName(y, x):
+    return "abcdefgh"[x] + str(y + 1)
+
+# (y, x) for a square name like "f5" or "F5".  Raises ValueError if it isn't one
+def parseSquare(name):
+    if len(name) != 2 or name[0].lower() not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError("{!r} is not a square".format(name))
+    return int(name[1]) - 1, "abcdefgh".index(name[0].lower())
+
+# all the squares where own can play, found with shift-and-mask floods in each direction
+def getMoves(own, other):
+    moves = 0
+    for shift, mask in DIRECTIONS:
+        o = other & mask
+        t = o & (own << shift)
+        t |= o & (t << shift)
+        t |= o & (t << shift)
+        t |= o & (t << shift)
+        t |= o & (t << shift)
+        t |= o & (t << shift)
+        moves |= t << shift
+        t = o & (own >> shift)
+        t |= o & (t >> shift)
+        t |= o & (t >> shift)
+        t |= o & (t >> shift)
+        t |= o & (t >> shift)
+        t |= o & (t >> shift)
+        moves |= t >> shift
+    return moves & ~(own | other) & FULL_BOARD
+
+# the pieces of other that own captures by playing on sq.  Along each ray the first
+# square that isn't other's has to be own's, and everything before it is captured
+def getFlips(sq, own, other):
+    flips = 0
+    notOther = ~other
+    for ray in raysUp[sq]:
+        stops = ray & notOther
+        first = stops & -stops
+        if first & own:
+            flips |= ray & (first - 1)
+    for ray in raysDown[sq]:
+        stops = ray & notOther
+        if stops:
+            first = 1 << (stops.bit_length() - 1)
+            if first & own:
+                flips |= ray & -(first << 1)
+    return flips
+
+# number of tiles colour would capture by playing at y, x
+def scoreTile(y, x, board, colour):
+    sq = y * 8 + x
+    if (board[0] | board[1]) >> sq & 1:
+        return 0
+    i = colourIndex(colour)
+    return popCount(getFlips(sq, board[i], board[1 - i]))
+
+# places a colour and turns the captured tiles.  Returns the captured tiles as a bitboard
+# so removePiece can take the move back
+def addPiece(y, x, board, colour):
+    sq = y * 8 + x
+    i = colourIndex(colour)
+    flips = getFlips(sq, board[i], board[1 - i])
+    board[i] |= (1 << sq) | flips
+    board[1 - i] ^= flips
+    return flips
+
+# takes back a move addPiece made, turning back only the tiles it captured
+def removePiece(y, x, board, colour, flips):
+    i = colourIndex(colour)
+    board[i] ^= (1 << (y * 8 + x)) | flips
+    board[1 - i] |= flips
+
+# recursive scoring function and wide scoring test.  Looks depth levels past the first and
+# keeps breadth fifths of the moves at each level
+def scoreBoard(board, colour, move, level, depth=0, breadth=0):
+    moveList = []
+    i = colourIndex(colour)
+    own, other = board[i], board[1 - i]
+    moves = getMoves(own, other)
+    while moves:
+        bit = moves & -moves
+        moves ^= bit
+        sq = bit.bit_length() - 1
+        moveList.append(Move(sq >> 3, sq & 7, popCount(getFlips(sq, own, other)) + advantageSq[sq]))
+
+    if moveList:
+        moveList.sort()
+        best = Move()
+        tiles = 0
+        initBest = False
+        length = len(moveList)
+        length = max(1,int(length*(breadth/5)))
+        moveList = moveList[-length:]
+        if level+1 > depth:
+            move.__dict__ = moveList[-1].__dict__.copy()
+            tiles = move.score - advantage[move.y][move.x]
+        else:
+            while moveList:
+                amove = moveList.pop()
+                flips = addPiece(amove.y, amove.x, board, colour)
+                omove = Move()
+                scoreBoard(board, swap(colour), omove, level+1, depth, breadth)
+                if amove.score - omove.score > best.score or not initBest:
+                    best = Move(amove.y, amove.x, amove.score)
+                    tiles = best.score - advantage[best.y][best.x]
+                    best.score -= omove.score
+                    initBest = True
+                removePiece(amove.y, amove.x, board, colour, flips) # reset
+            move.__dict__ = best.__dict__.copy()
+        if level == 0:
+            move.score = tiles
+    else:
+        move.y = -1
+
+# own's final disc count minus other's when the game ends, with the empty squares going to
+# the winner
+def finalScore(own, other):
+    diff = popCount(own) - popCount(other)
+    if diff > 0:
+        return diff + 64 - popCount(own | other)
+    if diff < 0:
+        return diff - 64 + popCount(own | other)
+    return 0
+
+# Zobrist key for the board with colour index side to move
+def boardKey(board, side):
+    key = zobristTurn if side else 0
+    for i in range(2):
+        data = board[i].to_bytes(8, "little")
+        tables = zobristBytes[i]
+        for byte in range(8):
+            key ^= tables[byte][data[byte]]
+    return key
+
+# the board in its canonical orientation, the smallest [white, black] of its 8 symmetries,
+# and the symmetry t that takes board there.  Positions that are mirror images of each
+# other have the same canonical board
+def canonicalBoard(board):
+    best, bestT = board, 0
+    white, black = board
+    for t in range(8):
+        if t == 4:
+            white, black = flipDiagonal(board[0]), flipDiagonal(board[1])
+        if t & 3:
+            whiteData, blackData = white.to_bytes(8, "little"), black.to_bytes(8, "little")
+            if t & 1:
+                whiteData, blackData = whiteData.translate(reverseBits), blackData.translate(reverseBits)
+            order = "big" if t & 2 else "little"
+            candidate = [int.from_bytes(whiteData, order), int.from_bytes(blackData, order)]
+        else:
+            candidate = [white, black]
+        if candidate < best:
+            best, bestT = candidate, t
+    return list(best), bestT
+
+# Zobrist key of board's canonical orientation with colour index side to move, and the
+# symmetry that takes board there.  A move stored under the key is a square on the
+# canonical board, so symmetrySq[inverseSymmetry[t]] maps it back to board
+def canonicalKey(board, side):
+    canonical, t = canonicalBoard(board)
+    return boardKey(canonical, side), t
+
+# how a Zobrist key changes when side plays sq and turns the pieces in flips
+def moveKey(side, sq, flips):
+    key = zobrist[side][sq] ^ zobristTurn
+    for table in zobristFlips:
+        if not flips:
+            break
+        key ^= table[flips & 255]
+        flips >>= 8
+    return key
+
+# count 64 bit ints, all 0.  They are in an anonymous memory map, which the OS zeroes a page
+# at a time as it is first used, so even a big transposition table costs nothing to make
+def zeroedWords(count):
+    return memoryview(mmap.mmap(-1, 8 * count)).cast("Q")
+
+# the score type to store for a fail-soft score best of a search with the window alpha, beta
+def ttFlag(best, alpha, beta):
+    if best <= alpha:
+        return TT_UPPER
+    if best >= beta:
+        return TT_LOWER
+    return TT_EXACT
+
+# fixed size hash table of search results, holding depth, score type, score and best move.
+# Each bucket has a depth-preferred slot, only replaced by an equal or deeper search or one
+# from an older move, and an always-replace slot for everything else.  Entries are packed
+# into 2 arrays of 64 bit ints so the memory used is exactly what was asked for
+class TranspositionTable:
+
+    def __init__(self, mb=TT_DEFAULT_MB):
+        buckets = 1
+        while buckets * 64 <= mb * 1024 * 1024:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.keys = zeroedWords(2 * buckets)
+        self.data = zeroedWords(2 * buckets)
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+        # what the scores in it were searched under (see Search.setRoot).  It's kept with the
+        # table so Searches sharing it only clear it once when that changes
+        self.mode = None
+
+    def __repr__(self):
+        return "[{:.0f} MB, {} probes, {:.1f}% hits, {:.1f}% used]".format(
+            len(self.keys) * 16 / 1024 / 1024, self.probes, 100 * self.hitRate(), 100 * self.usage())
+
+    # fraction of probes that found their position
+    def hitRate(self):
+        return self.hits / self.probes if self.probes else 0
+
+    # fraction of the first 1000 slots that are filled in
+    def usage(self):
+        sample = self.data[:1000]
+        return sum(1 for data in sample if data) / len(sample)
+
+    def clear(self):
+        self.keys = zeroedWords(len(self.keys))
+        self.data = zeroedWords(len(self.data))
+
+    # called once per AI move so that results from older moves can be replaced first
+    def newSearch(self):
+        self.generation = (self.generation + 1) & 63
+
+    # returns (depth, score type, score, best move) or None.  Keys are stored XORed with
+    # their data, so an entry another thread is halfway through writing doesn't match
+    def probe(self, key):
+        self.probes += 1
+        i = (key & self.mask) << 1
+        data = self.data[i]
+        if self.keys[i] ^ data != key:
+            i += 1
+            data = self.data[i]
+            if self.keys[i] ^ data != key:
+                return None
+        if not data:
+            return None
+        self.hits += 1
+        return (data >> 9) & 63, (data >> 7) & 3, (data >> 21) - SCORE_INFINITE, data & 127
+
+    def store(self, key, depth, flag, score, move):
+        self.stores += 1
+        i = (key & self.mask) << 1
+        old = self.data[i]
+        if old and self.keys[i] ^ old != key and ((old >> 9) & 63) > depth and ((old >> 15) & 63) == self.generation:
+            i += 1
+        data = ((score + SCORE_INFINITE) << 21) | (self.generation << 15) | (depth << 9) | (flag << 7) | move
+        self.data[i] = data
+        self.keys[i] = key ^ data
+
+# move ordering for the search: the hash move first, then the rest by the static score
+# getChildren sorts by, which has the square classes from the advantage table in it.  This
+# ply's killer moves (the last 2 moves that caused a cutoff at the same distance from the
+# root) get a small bonus on that score, and the history score for the colour playing
+# (how much search a move has cut off anywhere in the tree) breaks ties.  The static score
+# is the first term of the evaluation itself, so letting killers or history jump over it
+# searches more nodes, not fewer
+class MoveOrder:
+    def __init__(self):
+        self.killers = [[NO_MOVE, NO_MOVE] for ply in range(MAX_PLY)]
+        self.history = [array("q", bytes(8 * 64)) for side in range(2)]
+
+    # forgets the killers and ages the history at the start of a search
+    def newSearch(self):
+        for killers in self.killers:
+            killers[0] = killers[1] = NO_MOVE
+        for history in self.history:
+            for sq in range(64):
+                history[sq] >>= 1
+
+    # sorts children (score, square, bit, flips), already in static order, into search order.
+    # The sort is stable, so moves that tie stay in static order
+    def sort(self, children, hashMove, ply, side):
+        killer1, killer2 = self.killers[ply]
+        history = self.history[side]
+
+        def _priority(child):
+            sq = child[1]
+            if sq == hashMove:
+                return SCORE_INFINITE * HISTORY_MAX
+            bonus = KILLER_BONUS if sq == killer1 else KILLER_BONUS // 2 if sq == killer2 else 0
+            return (child[0] + bonus) * HISTORY_MAX + history[sq]
+
+        children.sort(key=_priority, reverse=True)
+
+    # which of CUT_HASH etc. put sq where it was in the order
+    def reason(self, sq, hashMove, ply, side):
+        if sq == hashMove:
+            return CUT_HASH
+        if sq in self.killers[ply]:
+            return CUT_KILLER
+        return CUT_HISTORY if self.history[side][sq] else CUT_STATIC
+
+    # records that sq, played by colour index side ply moves from the root with depth plies
+    # left, caused a cutoff
+    def cutoff(self, sq, ply, side, depth):
+        killers = self.killers[ply]
+        if killers[0] != sq:
+            killers[1] = killers[0]
+            killers[0] = sq
+        history = self.history[side]
+        history[sq] += depth * depth
+        if history[sq] > HISTORY_MAX:
+            for i in range(64):
+                history[i] >>= 1
+
+# raised inside the search when the clock runs out
+class SearchTimeout(Exception):
+    pass
+
+# (start, timeLimit) for what is left of timeLimit seconds from start, as if it started
+# now.  A timeLimit of 0, no limit, stays 0
+def timeLeft(start, timeLimit):
+    if not timeLimit:
+        return start, timeLimit
+    now = time.time()
+    return now, max(0.001, timeLimit - (now - start))
+
+# alpha-beta search (negamax with principal variation search and aspiration windows)
+# over the same move scores scoreBoard uses.  A side with no moves scores 0, as in scoreBoard
+class Search:
+    def __init__(self, ttMb=TT_DEFAULT_MB, workers=1, endgameEmpties=ENDGAME_EMPTIES):
+        self.nodes = 0
+        # what the last run did: leaf positions scored, beta cutoffs, and a dict for each
+        # finished iteration (see stats)
+        self.leaves = 0
+        self.cutoffs = 0
+        # cutoffs inside the tree made by the first move tried, and all of them by what put
+        # the move where it was in the order (CUT_HASH etc.)
+        self.firstCutoffs = 0
+        self.cutoffReasons = [0] * len(CUT_NAMES)
+        self.iterations = []
+        self.seconds = 0
+        self.result = None
+        self.tableStart = 0, 0 # table probes and hits when the last run began
+        # an open file to write a JSON line of stats to after every run, and a
+        # cProfile.Profile to run the searches under
+        self.log = None
+        self.profile = None
+        self.breadth = 5
+        self.ttMb = ttMb
+        self.table = TranspositionTable(ttMb)
+        self.deadline = None
+        # set by stop() from another thread, cleared when the run it stopped returns
+        self.stopped = False
+        # a multiprocessing.Event shared with the pool workers, set while stopped so they
+        # end the children they are searching too
+        self.stopEvent = None
+        self.depth = 0
+        self.order = MoveOrder()
+        self.rootDepth = 0 # depth of the pass being searched, to tell how far a node is from the root
+        self.workers = workers
+        self.pool = None
+        self.endgameEmpties = endgameEmpties
+        self.solved = False
+        # an opening book (see book.py) to play from before searching, and whether the
+        # last move came from it
+        self.book = None
+        self.fromBook = False
+        # a function giving the depth 1 scores of a batch of positions (batch.leafScores),
+        # to score the last ply a node at a time instead of a position at a time.  Not used
+        # with an evaluator
+        self.leafScores = None
+        # an evaluator (pattern.PatternEval) to score the positions at the end of the search
+        # with, instead of adding up the pieces each move captures.  Scores are then
+        # EVAL_DISC a disc.  Set it before the first search if there are workers
+        self.evaluator = None
+
+    # process pool for searching root moves in parallel, started the first time it's needed.
+    # Each worker gets its share of the transposition table memory
+    def getPool(self):
+        if self.pool is None:
+            import multiprocessing
+            import concurrent.futures
+            self.stopEvent = multiprocessing.Event()
+            if self.stopped:
+                self.stopEvent.set()
+            self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=initWorker,
+                                                               initargs=(max(1, self.ttMb // self.workers), self.evaluator, self.stopEvent))
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    # ends a run going on in another thread as soon as it has a move to play.  The pass it
+    # is on is dropped, along with the children the pool workers are searching for it, and
+    # run returns the last one that finished
+    def stop(self):
+        self.stopped = True
+        if self.stopEvent is not None:
+            self.stopEvent.set()
+        if self.deadline is not None:
+            self.deadline = time.time()
+
+    # sets the time the search has to end by, None for a pass that has to finish.  A stop()
+    # that came first still counts
+    def setDeadline(self, deadline):
+        if self.stopEvent is not None:
+            self.stopEvent.clear()
+        self.deadline = deadline
+        if self.stopped:
+            if self.stopEvent is not None:
+                self.stopEvent.set()
+            if deadline is not None:
+                self.deadline = time.time()
+
+    # whether the search has to end now: the deadline has passed or, in a pool worker, the
+    # search that handed it the child was stopped
+    def timeUp(self):
+        return time.time() > self.deadline or (self.stopEvent is not None and self.stopEvent.is_set())
+
+    # sets up board, with colour index side to move, as the position to search
+    def setRoot(self, board, side, breadth):
+        self.breadth = breadth
+        # Breadth changes which moves get searched and the evaluator what scores mean, so
+        # older scores no longer apply
+        mode = breadth, self.evaluator
+        if mode != self.table.mode:
+            if self.table.mode is not None:
+                self.table.clear()
+            self.table.mode = mode
+        self.board = list(board)
+        self.own, self.other, self.side = board[side], board[1 - side], side
+        self.key = boardKey(board, side)
+
+    # (score, square, bit, flips) for all of own's moves, best first and cut down by breadth
+    def getChildren(self, own, other):
+        children = []
+        moves = getMoves(own, other)
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+            sq = bit.bit_length() - 1
+            flips = getFlips(sq, own, other)
+            children.append((popCount(flips) + advantageSq[sq], sq, bit, flips))
+        children.sort(reverse=True)
+        children = children[:max(1, int(len(children) * (self.breadth / 5)))]
+        # with an evaluator moves gain nothing on their own, the order they're in is kept
+        if self.evaluator is not None:
+            children = [(0, sq, bit, flips) for score, sq, bit, flips in children]
+        return children
+
+    # best score own (colour index side, Zobrist key key) can get looking depth moves ahead,
+    # where moves score + and replies score -
+    def negamax(self, own, other, side, key, depth, alpha, beta):
+        self.nodes += 1
+        if self.deadline and not self.nodes & TIME_CHECK_NODES and self.timeUp():
+            raise SearchTimeout()
+        hashMove = NO_MOVE
+        tableKey, t = key, 0
+        # leaves are cheaper to score than to look up
+        entry = None
+        if depth > 1:
+            # Breadth breaks ties between equal scores by square, which mirror images don't
+            # share, so only full breadth searches can use each other's scores
+            if depth >= SYMMETRY_DEPTH and self.breadth == 5:
+                tableKey, t = self.canonicalKey(own, other, side)
+            entry = self.table.probe(tableKey)
+        if entry:
+            ttDepth, flag, ttScore, hashMove = entry
+            hashMove = symmetrySq[inverseSymmetry[t]][hashMove]
+            # scores from other depths sum up a different number of moves, so only the same
+            # depth can be used.  That also keeps scores the same whatever is in the table
+            if ttDepth == depth:
+                if flag == TT_EXACT or (flag == TT_LOWER and ttScore >= beta) or (flag == TT_UPPER and ttScore <= alpha):
+                    return ttScore
+        children = self.getChildren(own, other)
+        if self.evaluator is not None and (depth == 1 or not children):
+            return self.evaluateLeaves(children, own, other, side, key, depth, alpha, beta)
+        if not children:
+            self.leaves += 1
+            return 0
+        if depth == 1:
+            self.leaves += 1
+            return children[0][0]
+        # leafScores gives capture scores, which mean nothing next to an evaluator's
+        if depth == 2 and self.leafScores is not None and self.evaluator is None:
+            return self.scoreLeaves(children, own, other, tableKey, t, alpha, beta)
+        # the more search below a node the more its move order is worth spending on
+        ply = self.rootDepth - depth
+        if self.shallowOrdered(ply, depth):
+            children = self.shallowOrder(children, own, other, side, key, hashMove)
+        elif depth >= ORDER_DEPTH:
+            self.order.sort(children, hashMove, ply, side)
+        elif hashMove != NO_MOVE:
+            for i in range(1, len(children)):
+                if children[i][1] == hashMove:
+                    children.insert(0, children.pop(i))
+                    break
+        depth -= 1
+        alphaIn = alpha
+        best, bestMove = -SCORE_INFINITE, NO_MOVE
+        for score, sq, bit, flips in children:
+            # leaves don't use the table so they don't need a key
+            childKey = key ^ moveKey(side, sq, flips) if depth > 1 else 0
+            if best == -SCORE_INFINITE:
+                value = score - self.negamax(other ^ flips, own | bit | flips, 1 - side, childKey, depth, score - beta, score - alpha)
+            else:
+                # null window to prove this move is no better, full window only if it is
+                value = score - self.negamax(other ^ flips, own | bit | flips, 1 - side, childKey, depth, score - alpha - 1, score - alpha)
+                if alpha < value < beta:
+                    value = score - self.negamax(other ^ flips, own | bit | flips, 1 - side, childKey, depth, score - beta, score - alpha)
+            if value > best:
+                best, bestMove = value, sq
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        self.firstCutoffs += sq == children[0][1]
+                        self.cutoffReasons[self.cutoffReason(sq, hashMove, ply, side, depth + 1)] += 1
+                        if depth + 1 >= ORDER_DEPTH:
+                            self.order.cutoff(sq, ply, side, depth + 1)
+                        break
+        self.table.store(tableKey, depth + 1, ttFlag(best, alphaIn, beta), best, symmetrySq[t][bestMove])
+        return best
+
+    # whether a node ply plies from the root with depth plies left orders its moves with
+    # shallowOrder.  Near the root a mistake in the order costs the most
+    def shallowOrdered(self, ply, depth):
+        return depth >= SHALLOW_ORDER_DEPTH or (ply <= SHALLOW_ORDER_PLY and depth >= ORDER_DEPTH)
+
+    # children in the order of a SHALLOW_ORDER_PLIES search of each, the hash move first
+    def shallowOrder(self, children, own, other, side, key, hashMove):
+        values = []
+        for child in children:
+            score, sq, bit, flips = child
+            if sq == hashMove:
+                value = SCORE_INFINITE
+            else:
+                value = score - self.negamax(other ^ flips, own | bit | flips, 1 - side, key ^ moveKey(side, sq, flips),
+                                             SHALLOW_ORDER_PLIES, -SCORE_INFINITE, SCORE_INFINITE)
+            values.append((value, child))
+        values.sort(key=lambda value: value[0], reverse=True)
+        return [child for value, child in values]
+
+    # which of CUT_HASH etc. put the move sq that caused a cutoff where it was, for a node
+    # with depth plies left
+    def cutoffReason(self, sq, hashMove, ply, side, depth):
+        if sq == hashMove:
+            return CUT_HASH
+        if self.shallowOrdered(ply, depth):
+            return CUT_SHALLOW
+        if depth >= ORDER_DEPTH:
+            return self.order.reason(sq, hashMove, ply, side)
+        return CUT_STATIC
+
+    # negamax with an evaluator for a node with 1 ply left or no moves.  A side with no move
+    # passes and a game that is over scores its final result
+    def evaluateLeaves(self, children, own, other, side, key, depth, alpha, beta):
+        if not children:
+            if getMoves(other, own):
+                return -self.negamax(other, own, 1 - side, key ^ zobristTurn, depth, -beta, -alpha)
+            self.leaves += 1
+            return finalScore(own, other) * EVAL_DISC
+        self.leaves += len(children)
+        evaluate = self.evaluator.evaluate
+        return max(-evaluate(other ^ flips, own | bit | flips) for score, sq, bit, flips in children)
+
+    # negamax at depth 2 with all the leaves scored in 1 batch.  Without cutoffs the score
+    # is exact, which is also a correct fail-soft result
+    def scoreLeaves(self, children, own, other, key, t, alpha, beta):
+        self.nodes += len(children)
+        self.leaves += len(children)
+        values = self.leafScores([other ^ flips for score, sq, bit, flips in children],
+                                 [own | bit | flips for score, sq, bit, flips in children])
+        best, bestMove = -SCORE_INFINITE, NO_MOVE
+        for child, value in zip(children, values):
+            value = child[0] - int(value)
+            if value > best:
+                best, bestMove = value, child[1]
+        self.table.store(key, 2, ttFlag(best, alpha, beta), best, symmetrySq[t][bestMove])
+        return best
+
+    # key and symmetry for a node to use the table with in its canonical orientation, so
+    # mirror images share an entry.  Only worth it for nodes with a big search below them
+    def canonicalKey(self, own, other, side):
+        return canonicalKey([other, own] if side else [own, other], side)
+
+    # score of the root child (score, square, bit, flips) with depth more plies searched
+    # after it, inside the root window alpha, beta
+    def searchChild(self, child, depth, alpha, beta):
+        score, sq, bit, flips = child
+        if not depth:
+            self.leaves += 1
+            if self.evaluator is not None:
+                return -self.evaluator.evaluate(self.other ^ flips, self.own | bit | flips)
+            return score
+        return score - self.negamax(self.other ^ flips, self.own | bit | flips, 1 - self.side,
+                                    self.key ^ moveKey(self.side, sq, flips), depth, score - beta, score - alpha)
+
+    # same as negamax but for the root children, returning the score and the best child
+    def searchRoot(self, children, depth, alpha, beta):
+        self.nodes += 1
+        self.rootDepth = depth
+        best, bestChild = -SCORE_INFINITE, children[0]
+        depth -= 1
+        for child in children:
+            if best == -SCORE_INFINITE:
+                value = self.searchChild(child, depth, alpha, beta)
+            else:
+                value = self.searchChild(child, depth, alpha, alpha + 1)
+                if alpha < value < beta:
+                    value = self.searchChild(child, depth, alpha, beta)
+            if value > best:
+                best, bestChild = value, child
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        break
+        return best, bestChild
+
+    # searchRoot split over the process pool, young brothers wait style.  The first child
+    # is searched here for a score to beat, then the others are all tested against it at
+    # once and any that beat it are searched again with the full window.  Each child's
+    # score only depends on its own search, so the result is the same as searchRoot's
+    # however the workers are scheduled, with ties going to the earlier child
+    def searchRootParallel(self, children, depth, alpha, beta):
+        self.nodes += 1
+        self.rootDepth = depth
+        depth -= 1
+        best, bestChild = self.searchChild(children[0], depth, alpha, beta), children[0]
+        if best <= alpha or best >= beta or len(children) == 1:
+            return best, bestChild
+        rest = children[1:]
+        values = self.searchPool(rest, depth, best, best + 1)
+        better = [i for i in range(len(rest)) if values[i] > best]
+        for i, value in zip(better, self.searchPool([rest[i] for i in better], depth, best, beta)):
+            values[i] = value
+        for child, value in zip(rest, values):
+            if value > best:
+                best, bestChild = value, child
+        return best, bestChild
+
+    # searchChild for each of children in the pool workers, returning their scores in order.
+    # Once one of them is out of time the ones not started yet are cancelled
+    def searchPool(self, children, depth, alpha, beta):
+        pool = self.getPool()
+        futures = [pool.submit(searchWorker, self.board, self.side, self.breadth, self.table.generation,
+                               self.deadline, child, depth, alpha, beta) for child in children]
+        values = []
+        for future in futures:
+            value, nodes, leaves, cutoffs, firstCutoffs, cutoffReasons = future.result()
+            self.nodes += nodes
+            self.leaves += leaves
+            self.cutoffs += cutoffs
+            self.firstCutoffs += firstCutoffs
+            for i in range(len(CUT_NAMES)):
+                self.cutoffReasons[i] += cutoffReasons[i]
+            if value is None:
+                for future in futures:
+                    future.cancel()
+                raise SearchTimeout()
+            values.append(value)
+        return values
+
+    # own's exact final score (see finalScore) with perfect play by both sides.  empties is
+    # the number of empty squares.  Alpha-beta like negamax, but to the end of the game
+    def solve(self, own, other, side, key, alpha, beta, empties):
+        self.nodes += 1
+        if self.deadline and not self.nodes & TIME_CHECK_NODES and self.timeUp():
+            raise SearchTimeout()
+        if empties <= 3:
+            return self.solveLast(own, other, alpha, beta, empties)
+        moves = getMoves(own, other)
+        if not moves:
+            if getMoves(other, own):
+                return -self.solve(other, own, 1 - side, key ^ zobristTurn, -beta, -alpha, empties)
+            return finalScore(own, other)
+        hashMove = NO_MOVE
+        tableKey, t = key, 0
+        if empties >= ENDGAME_TT_EMPTIES:
+            if empties >= SYMMETRY_EMPTIES:
+                tableKey, t = self.canonicalKey(own, other, side)
+            entry = self.table.probe(tableKey)
+            if entry:
+                ttDepth, flag, ttScore, hashMove = entry
+                hashMove = symmetrySq[inverseSymmetry[t]][hashMove]
+                if ttDepth == ENDGAME_DEPTH:
+                    if flag == TT_EXACT or (flag == TT_LOWER and ttScore >= beta) or (flag == TT_UPPER and ttScore <= alpha):
+                        return ttScore
+        children = self.getEndgameChildren(own, other, moves, empties, hashMove)
+        empties -= 1
+        alphaIn = alpha
+        best, bestMove = -SCORE_INFINITE, NO_MOVE
+        for order, sq, bit, flips in children:
+            childKey = key ^ moveKey(side, sq, flips) if empties >= ENDGAME_TT_EMPTIES else 0
+            if best == -SCORE_INFINITE:
+                value = -self.solve(other ^ flips, own | bit | flips, 1 - side, childKey, -beta, -alpha, empties)
+            else:
+                value = -self.solve(other ^ flips, own | bit | flips, 1 - side, childKey, -alpha - 1, -alpha, empties)
+                if alpha < value < beta:
+                    value = -self.solve(other ^ flips, own | bit | flips, 1 - side, childKey, -beta, -alpha, empties)
+            if value > best:
+                best, bestMove = value, sq
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        break
+        if empties + 1 >= ENDGAME_TT_EMPTIES:
+            self.table.store(tableKey, ENDGAME_DEPTH, ttFlag(best, alphaIn, beta), best, symmetrySq[t][bestMove])
+        return best
+
+    # (order, square, bit, flips) for own's moves, sorted so the hash move goes first, then
+    # fastest-first (fewest replies for other) or, with few empty squares left where that
+    # costs more than it saves, moves into odd quadrants first
+    def getEndgameChildren(self, own, other, moves, empties, hashMove):
+        children = []
+        empty = ~(own | other) & FULL_BOARD
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+            sq = bit.bit_length() - 1
+            flips = getFlips(sq, own, other)
+            if sq == hashMove:
+                order = -1
+            elif empties >= ENDGAME_FASTEST:
+                order = popCount(getMoves(other ^ flips, own | bit | flips))
+            else:
+                order = 0 if popCount(empty & quadrantOf[sq]) & 1 else 1
+            children.append((order, sq, bit, flips))
+        children.sort()
+        return children
+
+    # solve for the last 3 or fewer empty squares, without move generation.  With 3 left a
+    # square alone in its quadrant is tried first
+    def solveLast(self, own, other, alpha, beta, empties):
+        empty = ~(own | other) & FULL_BOARD
+        squares = []
+        while empty:
+            bit = empty & -empty
+            empty ^= bit
+            squares.append(bit.bit_length() - 1)
+        if empties == 3:
+            a, b, c = squares
+            if quadrantOf[a] == quadrantOf[b]:
+                a, c = c, a
+            elif quadrantOf[a] == quadrantOf[c]:
+                a, b = b, a
+            return self.solve3(own, other, alpha, beta, a, b, c)
+        if empties == 2:
+            return self.solve2(own, other, alpha, beta, squares[0], squares[1])
+        if empties == 1:
+            return self.solve1(own, other, squares[0])
+        return finalScore(own, other)
+
+    def solve3(self, own, other, alpha, beta, a, b, c):
+        self.nodes += 1
+        best = -SCORE_INFINITE
+        for sq, rest1, rest2 in ((a, b, c), (b, a, c), (c, a, b)):
+            flips = getFlips(sq, own, other)
+            if flips:
+                value = -self.solve2(other ^ flips, own | (1 << sq) | flips, -beta, -alpha, rest1, rest2)
+                if value > best:
+                    best = value
+                    if value > alpha:
+                        alpha = value
+                        if alpha >= beta:
+                            self.cutoffs += 1
+                            return best
+        if best != -SCORE_INFINITE:
+            return best
+        if getFlips(a, other, own) or getFlips(b, other, own) or getFlips(c, other, own):
+            return -self.solve3(other, own, -beta, -alpha, a, b, c)
+        return finalScore(own, other)
+
+    def solve2(self, own, other, alpha, beta, a, b):
+        self.nodes += 1
+        best = -SCORE_INFINITE
+        flips = getFlips(a, own, other)
+        if flips:
+            best = -self.solve1(other ^ flips, own | (1 << a) | flips, b)
+            if best >= beta:
+                self.cutoffs += 1
+                return best
+        flips = getFlips(b, own, other)
+        if flips:
+            value = -self.solve1(other ^ flips, own | (1 << b) | flips, a)
+            if value > best:
+                best = value
+        if best != -SCORE_INFINITE:
+            return best
+        if getFlips(a, other, own) or getFlips(b, other, own):
+            return -self.solve2(other, own, -beta, -alpha, a, b)
+        return finalScore(own, other)
+
+    # the last empty square: whoever can play there fills the board
+    def solve1(self, own, other, sq):
+        self.nodes += 1
+        self.leaves += 1
+        flips = getFlips(sq, own, other)
+        if flips:
+            return 2 * (popCount(own | flips) + 1) - 64
+        flips = getFlips(sq, other, own)
+        if flips:
+            return 64 - 2 * (popCount(other | flips) + 1)
+        return finalScore(own, other)
+
+    # solves the root position, returning (score, square, flips) for the best move
+    def solveRoot(self, empties):
+        self.nodes += 1
+        moves = getMoves(self.own, self.other)
+        children = self.getEndgameChildren(self.own, self.other, moves, empties, NO_MOVE)
+        alpha, beta = -SCORE_INFINITE, SCORE_INFINITE
+        best, bestChild = -SCORE_INFINITE, children[0]
+        for child in children:
+            order, sq, bit, flips = child
+            own, other = self.other ^ flips, self.own | bit | flips
+            key = self.key ^ moveKey(self.side, sq, flips)
+            if best == -SCORE_INFINITE:
+                value = -self.solve(own, other, 1 - self.side, key, -beta, -alpha, empties - 1)
+            else:
+                value = -self.solve(own, other, 1 - self.side, key, -alpha - 1, -alpha, empties - 1)
+                if value > alpha:
+                    value = -self.solve(own, other, 1 - self.side, key, -beta, -alpha, empties - 1)
+            if value > best:
+                best, bestChild = value, child
+                alpha = max(alpha, value)
+        return best, bestChild[1], bestChild[3]
+
+    # searches the moves for colour index side on board 1 ply deeper at a time up to depth.
+    # Each pass tries the last best move first and starts with a window around the score
+    # from 2 plies back, the last time the search ended on the same side.  With a timeLimit
+    # (seconds) it keeps going until the time is up or the board is full and returns the
+    # result of the deepest pass that finished.  Returns (score, square, flips) or None to pass
+    def run(self, board, side, depth, breadth, timeLimit=0):
+        return self.measure(self.runSearch, board, side, depth, breadth, timeLimit)
+
+    # searches like run but scores count of the moves exactly instead of just the best, for
+    # hints and analysis.  The other moves are only shown to be no better than the last of
+    # those.  Returns a list of (score, square, flips, exact, line) for every move searched,
+    # best first, where exact is False for a score that is only an upper bound and line is
+    # the principal variation from the move on (see principalVariation).  Empty to pass.
+    # The book and the workers aren't used
+    def analyse(self, board, side, count, depth, breadth, timeLimit=0):
+        self.lines = []
+        self.measure(self.runAnalysis, board, side, count, depth, breadth, timeLimit)
+        return self.lines
+
+    # runs search(*args, start) with the stats reset, profiling and logging it, and keeps
+    # its (score, square, flips) in result for stats
+    def measure(self, search, *args):
+        start = time.time()
+        self.nodes = self.leaves = self.cutoffs = self.firstCutoffs = self.depth = 0
+        self.cutoffReasons = [0] * len(CUT_NAMES)
+        self.fromBook = self.solved = False
+        self.iterations = []
+        self.tableStart = self.table.probes, self.table.hits
+        if self.profile is not None:
+            self.result = self.profile.runcall(search, *args, start)
+        else:
+            self.result = search(*args, start)
+        self.stopped = False
+        self.seconds = time.time() - start
+        if self.log is not None:
+            import json
+            self.log.write(json.dumps(self.stats()) + "\n")
+            self.log.flush()
+        return self.result
+
+    # adds a stats dict for the iteration to depth that began with the counts in mark,
+    # (nodes, leaves, cutoffs, table hits, time), and returns the mark for the next one
+    def endIteration(self, depth, mark):
+        nodes = self.nodes - mark[0]
+        last = self.iterations[-1]["nodes"] if self.iterations else 0
+        self.iterations.append({
+            "depth": depth,
+            "nodes": nodes,
+            "leaves": self.leaves - mark[1],
+            "cutoffs": self.cutoffs - mark[2],
+            "ttHits": self.table.hits - mark[3],
+            "seconds": round(time.time() - mark[4], 4),
+            # nodes over the last iteration's, the effective branching factor
+            "branching": round(nodes / last, 2) if last else None,
+        })
+        return self.nodes, self.leaves, self.cutoffs, self.table.hits, time.time()
+
+    # Search.run without the stats and profiling around it
+    def runSearch(self, board, side, depth, breadth, timeLimit, start):
+        self.setRoot(board, side, breadth)
+        self.table.newSearch()
+        self.order.newSearch()
+        children = self.getChildren(self.own, self.other)
+        if not children:
+            return None
+        if self.book is not None:
+            entry = self.book.probe(board, side)
+            # the move is checked in case 2 positions share a key
+            flips = entry and getFlips(entry[0], self.own, self.other)
+            if flips:
+                self.fromBook = True
+                return entry[1], entry[0], flips
+        # close to the end play perfectly, unless that runs out of time
+        empties = 64 - popCount(board[0] | board[1])
+        if empties <= self.endgameEmpties:
+            self.setDeadline(start + timeLimit * ENDGAME_TIME_SHARE if timeLimit else NO_DEADLINE)
+            mark = self.nodes, self.leaves, self.cutoffs, self.table.hits, time.time()
+            try:
+                result = self.solveRoot(empties)
+                self.solved = True
+                self.depth = empties
+                self.deadline = None
+                self.endIteration(empties, mark)
+                return result
+            except SearchTimeout:
+                # the passes below get what is left of the time
+                start, timeLimit = timeLeft(start, timeLimit)
+        if timeLimit:
+            depth = 64 - popCount(board[0] | board[1])
+            if len(children) == 1:
+                depth = 1
+        scores = {}
+        result = None
+        mark = self.nodes, self.leaves, self.cutoffs, self.table.hits, time.time()
+        for d in range(1, depth + 1):
+            if self.stopped and result:
+                break
+            guess = scores.get(d - 2)
+            if guess is None:
+                alpha, beta = -SCORE_INFINITE, SCORE_INFINITE
+            else:
+                alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+            # the 1st pass always finishes so there's a move to play
+            self.setDeadline((start + timeLimit if timeLimit else NO_DEADLINE) if result else None)
+            try:
+                # the pool only pays for itself once the children have moves of their own to search
+                searchRoot = self.searchRootParallel if self.workers > 1 and d > 2 else self.searchRoot
+                while True:
+                    score, best = searchRoot(children, d, alpha, beta)
+                    if score <= alpha:
+                        alpha = -SCORE_INFINITE
+                    elif score >= beta:
+                        beta = SCORE_INFINITE
+                    else:
+                        break
+            except SearchTimeout:
+                break
+            self.depth = d
+            mark = self.endIteration(d, mark)
+            scores[d] = score
+            result = score, best[1], best[3]
+            children.remove(best)
+            children.insert(0, best)
+            # the next pass takes longer than all the ones before it so don't start it late
+            if timeLimit and time.time() - start > timeLimit / 2:
+                break
+        self.deadline = None
+        return result
+
+    # Search.analyse without the stats and profiling around it.  Leaves the moves in lines
+    # and returns the best like runSearch
+    def runAnalysis(self, board, side, count, depth, breadth, timeLimit, start):
+        self.setRoot(board, side, breadth)
+        self.table.newSearch()
+        self.order.newSearch()
+        if not getMoves(self.own, self.other):
+            return None
+        count = max(1, count)
+        empties = 64 - popCount(board[0] | board[1])
+        lines = None
+        if empties <= self.endgameEmpties:
+            self.setDeadline(start + timeLimit * ENDGAME_TIME_SHARE if timeLimit else NO_DEADLINE)
+            mark = self.nodes, self.leaves, self.cutoffs, self.table.hits, time.time()
+            children = self.getEndgameChildren(self.own, self.other, getMoves(self.own, self.other), empties, NO_MOVE)
+            try:
+                lines = self.searchRootMulti(children, count, lambda child, alpha, beta: self.solveChild(child, empties, alpha, beta))
+                self.solved = True
+                self.depth = empties
+                self.endIteration(empties, mark)
+            except SearchTimeout:
+                # the passes get what is left of the time
+                start, timeLimit = timeLeft(start, timeLimit)
+        if lines is None:
+            children = self.getChildren(self.own, self.other)
+            if timeLimit:
+                depth = 64 - popCount(board[0] | board[1])
+            mark = self.nodes, self.leaves, self.cutoffs, self.table.hits, time.time()
+            for d in range(1, depth + 1):
+                if self.stopped and lines:
+                    break
+                self.setDeadline((start + timeLimit if timeLimit else NO_DEADLINE) if lines else None)
+                self.rootDepth = d
+                try:
+                    passLines = self.searchRootMulti(children, count, lambda child, alpha, beta: self.searchChild(child, d - 1, alpha, beta))
+                except SearchTimeout:
+                    break
+                lines = passLines
+                self.depth = d
+                mark = self.endIteration(d, mark)
+                # the next pass tries the moves in this one's order
+                children = [child for value, exact, child in lines]
+                if timeLimit and time.time() - start > timeLimit / 2:
+                    break
+        self.deadline = None
+        if not lines:
+            return None
+        for value, exact, (score, sq, bit, flips) in lines:
+            line = [sq]
+            if exact:
+                after = [0, 0]
+                after[side], after[1 - side] = self.own | bit | flips, self.other ^ flips
+                line += self.principalVariation(after, 1 - side, PV_LENGTH - 1)
+            self.lines.append((value, sq, flips, exact, line))
+        return self.lines[0][:3]
+
+    # own's exact final score after the root child (order, square, bit, flips), inside the
+    # root window alpha, beta.  empties is the number of empty squares at the root
+    def solveChild(self, child, empties, alpha, beta):
+        order, sq, bit, flips = child
+        return -self.solve(self.other ^ flips, self.own | bit | flips, 1 - self.side,
+                           self.key ^ moveKey(self.side, sq, flips), -beta, -alpha, empties - 1)
+
+    # scores children with value(child, alpha, beta) so the best count of them are exact.
+    # The first count get the full window; after that each is tested against the worst of
+    # the count best so far and only searched in full if it beats it.  Returns a list of
+    # (score, exact, child), best first with exact scores before bounds of the same value
+    def searchRootMulti(self, children, count, value):
+        self.nodes += 1
+        lines, best = [], []
+        for child in children:
+            if len(best) < count:
+                score, exact = value(child, -SCORE_INFINITE, SCORE_INFINITE), True
+            else:
+                bound = best[count - 1]
+                score = value(child, bound, bound + 1)
+                exact = score > bound
+                if exact:
+                    score = value(child, bound, SCORE_INFINITE)
+            if exact:
+                best.append(score)
+                best.sort(reverse=True)
+            lines.append((score, exact, child))
+        lines.sort(key=lambda line: (line[0], line[1]), reverse=True)
+        return lines
+
+    # the table's best move for colour index side on board, NO_MOVE if it has none
+    def hashMove(self, board, side):
+        entry = self.table.probe(boardKey(board, side))
+        if entry:
+            return entry[3]
+        key, t = canonicalKey(board, side)
+        entry = self.table.probe(key)
+        return symmetrySq[inverseSymmetry[t]][entry[3]] if entry else NO_MOVE
+
+    # the line of play the table expects from colour index side on board, up to length
+    # moves, as square numbers with NO_MOVE for a pass.  Search the position first; the
+    # line stops where the table has no move
+    def principalVariation(self, board, side, length):
+        board, line = list(board), []
+        while len(line) < length:
+            own, other = board[side], board[1 - side]
+            moves = getMoves(own, other)
+            if not moves:
+                if not getMoves(other, own):
+                    break
+                line.append(NO_MOVE)
+                side = 1 - side
+                continue
+            sq = self.hashMove(board, side)
+            if sq == NO_MOVE or not moves >> sq & 1:
+                break
+            flips = getFlips(sq, own, other)
+            board[side] = own | (1 << sq) | flips
+            board[1 - side] = other ^ flips
+            line.append(sq)
+            side = 1 - side
+        # a trailing pass isn't part of any line
+        while line and line[-1] == NO_MOVE:
+            line.pop()
+        return line
+
+    # a dict of what the last run did, for logs and benchmarks
+    def stats(self):
+        probes, hits = self.table.probes - self.tableStart[0], self.table.hits - self.tableStart[1]
+        sq = self.result[1] if self.result else None
+        return {
+            "move": squareName(sq >> 3, sq & 7) if sq is not None else None,
+            "score": self.result[0] if self.result else None,
+            "depth": self.depth,
+            "book": self.fromBook,
+            "solved": self.solved,
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "cutoffs": self.cutoffs,
+            "firstCutoffRate": round(self.firstCutoffRate(), 4),
+            "cutoffOrder": dict(zip(CUT_NAMES, self.cutoffReasons)),
+            "ttProbes": probes,
+            "ttHits": hits,
+            "seconds": round(self.seconds, 4),
+            "nodesPerSecond": int(self.nodes / self.seconds) if self.seconds else None,
+            "iterations": self.iterations,
+        }
+
+    # share of the cutoffs inside the tree made by the first move tried, how often the move
+    # order got it right
+    def firstCutoffRate(self):
+        return self.firstCutoffs / max(1, sum(self.cutoffReasons))
+
+    # one line summary of the last run for the game's status line
+    def statusLine(self):
+        if self.fromBook:
+            return "Book move"
+        depth = "Solved {} empty".format(self.depth) if self.solved else "Depth {}".format(self.depth)
+        branching = self.iterations[-1]["branching"] if self.iterations else None
+        return "{}  {} nodes  {} leaves  {} cutoffs  {:.0%} 1st  {:.0%} tt  bf {}  {:.2f}s".format(
+            depth, self.nodes, self.leaves, self.cutoffs, self.firstCutoffRate(),
+            (self.table.hits - self.tableStart[1]) / max(1, self.table.probes - self.tableStart[0]),
+            branching or "-", self.seconds)
+
+# each process pool worker keeps its own Search so its table lasts from move to move.
+# stopEvent is the pool owner's Search.stopEvent
+def initWorker(ttMb, evaluator, stopEvent):
+    global workerSearch
+    workerSearch = Search(ttMb)
+    workerSearch.evaluator = evaluator
+    workerSearch.stopEvent = stopEvent
+
+# Search.searchChild run in a pool worker.  Returns (score, nodes, leaves, cutoffs,
+# firstCutoffs, cutoffReasons) with score None if the deadline passed or the search was
+# stopped first
+def searchWorker(board, side, breadth, generation, deadline, child, depth, alpha, beta):
+    search = workerSearch
+    search.setRoot(board, side, breadth)
+    search.table.generation = generation
+    search.nodes = search.leaves = search.cutoffs = search.firstCutoffs = 0
+    search.cutoffReasons = [0] * len(CUT_NAMES)
+    search.rootDepth = depth + 1
+    search.deadline = deadline
+    try:
+        # a child that was waiting when the search stopped isn't started
+        if deadline and search.timeUp():
+            raise SearchTimeout()
+        value = search.searchChild(child, depth, alpha, beta)
+    except SearchTimeout:
+        value = None
+    return value, search.nodes, search.leaves, search.cutoffs, search.firstCutoffs, search.cutoffReasons
+
+# a game in progress: the [white, black] board and the colour to move
+class Position:
+    def __init__(self, board=None, colour=BLACK):
+        self.board = [START_WHITE, START_BLACK] if board is None else list(board)
+        self.colour = colour
+
+    def __repr__(self):
+        rows = ["".join(contents(self.board, y, x) if contents(self.board, y, x) != BLANK else '.' for x in range(8)) for y in range(8)]
+        return "\n".join(rows) + "\n{} to move".format(self.colour)
+
+    def copy(self):
+        return Position(self.board, self.colour)
+
+    # [white, black] piece counts
+    def score(self):
+        return [popCount(self.board[0]), popCount(self.board[1])]
+
+    # bitboard of the squares the colour to move can play on
+    def moveBits(self):
+        i = colourIndex(self.colour)
+        return getMoves(self.board[i], self.board[1 - i])
+
+    # (y, x) of every move the colour to move can make, in board order
+    def legalMoves(self):
+        moves = self.moveBits()
+        return [(sq >> 3, sq & 7) for sq in range(64) if moves >> sq & 1]
+
+    # plays y, x for the colour to move and hands the turn over.  Returns the captured
+    # tiles as a bitboard, or raises ValueError if it isn't a legal move
+    def play(self, y, x):
+        if not 0 <= y < 8 or not 0 <= x < 8 or not self.moveBits() >> (y * 8 + x) & 1:
+            raise ValueError("({},{}) is not a legal move for {}".format(y, x, self.colour))
+        flips = addPiece(y, x, self.board, self.colour)
+        self.colour = swap(self.colour)
+        return flips
+
+    # hands the turn over without playing
+    def passTurn(self):
+        self.colour = swap(self.colour)
+
+    # plays a move list like "f5d6c3d3", passing for any colour that can't move first
+    def playMoves(self, moves):
+        for i in range(0, len(moves), 2):
+            if not self.moveBits():
+                self.passTurn()
+            self.play(*parseSquare(moves[i:i + 2]))
+
+    # the game ends when neither colour can play
+    def isGameOver(self):
+        return not getMoves(self.board[0], self.board[1]) and not getMoves(self.board[1], self.board[0])
+
+# the Search bestMove uses when it isn't given one, made the first time it is needed
+defaultSearch = None
+
+# the Search to use when a caller doesn't give one
+def getSearch(search):
+    global defaultSearch
+    if search is not None:
+        return search
+    if defaultSearch is None:
+        defaultSearch = Search()
+    return defaultSearch
+
+# searches position and returns the Move the colour to move should play, with the search
+# score in score, or a Move with y == -1 if it has to pass.  depth is in plies (1 is only
+# the next move), breadth 0-5 and timeLimit in seconds (0 searches to depth).  Pass a
+# Search to pick the table size and workers or to keep the table between calls.  With
+# search.endgameEmpties or fewer empty squares left the move is perfect and score is the
+# final disc difference, as from solveEndgame
+def bestMove(position, depth=1, breadth=5, timeLimit=0, search=None):
+    search = getSearch(search)
+    result = search.run(position.board, colourIndex(position.colour), depth, breadth, timeLimit)
+    if result is None:
+        return Move()
+    score, sq, flips = result
+    return Move(sq >> 3, sq & 7, score)
+
+# searches position like bestMove but for the best count moves, each with its score found
+# exactly (see Search.analyse).  Returns the Moves best first, each with line, the moves
+# expected from it on as (y, x) with (-1, -1) for a pass.  Empty if it has to pass
+def topMoves(position, count=3, depth=1, breadth=5, timeLimit=0, search=None):
+    search = getSearch(search)
+    lines = search.analyse(position.board, colourIndex(position.colour), count, depth, breadth, timeLimit)
+    moves = []
+    for score, sq, flips, exact, line in lines[:count]:
+        move = Move(sq >> 3, sq & 7, score)
+        move.line = [(-1, -1) if s == NO_MOVE else (s >> 3, s & 7) for s in line]
+        moves.append(move)
+    return moves
+
+# solves position exactly, however many empty squares it has (so keep it to the last 20 or
+# so).  Returns the best Move with score the final disc difference for the colour to move
+# (empty squares go to the winner), or a Move with y == -1 if it has to pass
+def solveEndgame(position, search=None):
+    search = getSearch(search)
+    i = colourIndex(position.colour)
+    search.nodes = 0
+    # exact scores don't depend on breadth, so keep the table's
+    search.setRoot(position.board, i, search.breadth)
+    search.table.newSearch()
+    if not getMoves(search.own, search.other):
+        return Move()
+    score, sq, flips = search.solveRoot(64 - popCount(position.board[0] | position.board[1]))
+    search.solved = True
+    return Move(sq >> 3, sq & 7, score)
@@ -10,17 +10,17 @@ Versions:
     V1.5 - 24 Jan 2017 - Put in new menu system.  Affects only AI Settings
 """
 
+import os
 import curses
 import time
-import copy
-
-windows = False
-try:
-    import msvcrt
-    windows = True
-except ImportError as e:
-    import sys
-    import select
+import argparse
+import threading
+from array import array
+from book import BOOK_DEFAULT_FILE, OpeningBook
+from pattern import WEIGHTS_DEFAULT_FILE, loadEvaluator
+from records import GameWriter
+from engine import (BLANK, WHITE, BLACK, START_WHITE, START_BLACK, TT_DEFAULT_MB, ENDGAME_EMPTIES, EVAL_DISC, Move,
+                    Search, swap, colourIndex, contents, popCount, getMoves, scoreTile, addPiece, squareName)
 
 INPUT_MOTION        = [curses.KEY_UP, curses.KEY_DOWN]
 INPUT_SELECT        = [curses.KEY_ENTER, 10, 13]
@@ -28,13 +28,23 @@ INPUT_BACKUP        = 27 # ESC key
 INPUT_UNDO          = 117 # u key
 INPUT_REDO          = 114 # r key
 INPUT_COMMAND       = [INPUT_BACKUP, INPUT_UNDO, INPUT_REDO]
+INPUT_MOVE_NOW      = 109 # m key
+INPUT_HINT          = 104 # h key
 SCROLL_SPEED        = 0.15
-BLANK               = ' '
-WHITE               = 'O'
-BLACK               = 'X'
+THINK_POLL          = 0.1 # seconds between progress updates while the AI thinks
+THINK_SPINNER       = "|/-\\"
+PONDER_PREDICT      = 4 # most plies searched to guess the human's move before pondering
+UNDO_CHECKPOINT     = 16 # UndoRedo keeps a whole board every this many plies
+HINT_MOVES          = 3 # moves the hints number on the board
+HINT_DEPTH          = 6 # plies the hints search
+HINT_TT_MB          = 16 # the hints' own transposition table, so they don't disturb the AI's
 CELL_W              = 3
 CELL_H              = 1
 
+# AI time control choices: (menu label, seconds per move, seconds per game).  Off uses Depth
+TIME_SETTINGS       = [("Off", 0, 0), ("1s a move", 1, 0), ("2s a move", 2, 0), ("5s a move", 5, 0),
+                       ("10s a move", 10, 0), ("1m a game", 0, 60), ("5m a game", 0, 300)]
+
 CR_BLUE_CYAN        = 1
 CR_BLACK_CYAN       = 2
 CR_WHITE_CYAN       = 3
@@ -180,88 +190,93 @@ def menu(menuItems):
 
     # get time for scrolling putposes
     startTime = time.time()
-    # go into the main loop
-    while True:
-        # get time now to calculate elapsed time
-        thisTime = time.time()
-        # start at the top to draw
-        line = menuItems.y
-
-        # show the visible menu items, highlighting the selected item
-        for i in range(topItem, min(numMenuItems,topItem+numVisibleItems)):
-            display = " {:{width}} "
-            if menuItems.states is None or i >= len(menuItems.states) or menuItems.states[i]:
-                color = curses.color_pair(MENU_CLR_ITEMS)
-            else:
-                color = curses.color_pair(MENU_CLR_DISABLED)
-            if i == selectedItem:
-                display = ">{:{width}}<"
-                color = curses.color_pair(MENU_CLR_SELECT)
-                # if the item is longer than the menu width, bounce the item back and forth in the menu display
-                if thisTime-startTime > SCROLL_SPEED:
-                    displayLength = len(menuItems.items[i])
-                    if displayLength > menuItems.width:
-                        itemOffset += itemDirection
-                        # swap scroll itemDirection but hold for one frame at either end
-                        if itemOffset == 0 or itemOffset > displayLength - menuItems.width:
-                            if itemDirection:
-                                itemDirection = 0
-                            elif itemOffset == 0:
-                                itemDirection = 1
-                            else:
-                                itemDirection = -1
-            # put ^ or V on the top/bottom lines if there are more options but keep > on selected
-            if i == topItem and topItem != 0:
-                display = display[:len(display)-1]+"^"
-            elif i == topItem+numVisibleItems-1 and i != numMenuItems-1:
-                display = display[:len(display)-1]+"v"
-            
-            # format the line for display
-            if i == selectedItem:
-                display = display.format(menuItems.items[i][itemOffset:itemOffset+menuItems.width], width=menuItems.width)
-            else:
-                display = display.format(menuItems.items[i][:menuItems.width], width=menuItems.width)
-
-            # show the item
-            stdscr.addstr(line, menuItems.x, display, color)
-            line += 1
-
-        # pad out the footer area, if there is one
-        while line < menuItems.y + numVisibleItems + numMenuFooters:
-            stdscr.addstr(line, menuItems.x, " " * (2 + menuItems.width), curses.color_pair(MENU_CLR_FOOTER))
-            line += 1
-
-        # display the footer if there is one
-        if menuItems.footer is not None:
-            stdscr.addstr(line, menuItems.x, " " + menuItems.footer[footerOffset:footerOffset+menuItems.width], curses.color_pair(MENU_CLR_FOOTER))
-            remain = footerLength-footerOffset
-            while remain < menuItems.width:
-                string = menuItems.footer[:menuItems.width-remain]
-                stdscr.addstr(line, menuItems.x+1+remain, string, curses.color_pair(MENU_CLR_FOOTER))
-                remain += len(string)
-            stdscr.addstr(" ", curses.color_pair(MENU_CLR_FOOTER))
-
-        # make it all visible
-        stdscr.refresh()
+    # only draw when something has changed.  Between changes wait for a key, but no longer
+    # than the scrolling needs
+    redraw = True
+    stdscr.timeout(int(SCROLL_SPEED * 1000))
+    try:
+        # go into the main loop
+        while True:
+            # get time now to calculate elapsed time
+            thisTime = time.time()
 
-        # calculate a new scroll position for the footer
-        if thisTime-startTime > SCROLL_SPEED:
-            footerOffset += 1
-            startTime = time.time()
-            if footerOffset == footerLength:
-                footerOffset = 0
-
-        # test keys and deal with key presses
-        keyPressed = 0
-        if windows:
-            keyPressed = msvcrt.kbhit()
-        else:
-            dr, dw, de = select.select([sys.stdin], [], [], 0)
-            if not dr == []:
-                keyPressed = 1
+            # move the scrolling text along
+            if thisTime-startTime > SCROLL_SPEED:
+                startTime = thisTime
+                # if the item is longer than the menu width, bounce the item back and forth in the menu display
+                displayLength = len(menuItems.items[selectedItem]) if selectedItem < numMenuItems else 0
+                if displayLength > menuItems.width:
+                    itemOffset += itemDirection
+                    # swap scroll itemDirection but hold for one frame at either end
+                    if itemOffset == 0 or itemOffset > displayLength - menuItems.width:
+                        if itemDirection:
+                            itemDirection = 0
+                        elif itemOffset == 0:
+                            itemDirection = 1
+                        else:
+                            itemDirection = -1
+                    redraw = True
+                # calculate a new scroll position for the footer
+                if menuItems.footer:
+                    footerOffset += 1
+                    if footerOffset == footerLength:
+                        footerOffset = 0
+                    redraw = True
+
+            if redraw:
+                redraw = False
+                # start at the top to draw
+                line = menuItems.y
+
+                # show the visible menu items, highlighting the selected item
+                for i in range(topItem, min(numMenuItems,topItem+numVisibleItems)):
+                    display = " {:{width}} "
+                    if menuItems.states is None or i >= len(menuItems.states) or menuItems.states[i]:
+                        color = curses.color_pair(MENU_CLR_ITEMS)
+                    else:
+                        color = curses.color_pair(MENU_CLR_DISABLED)
+                    if i == selectedItem:
+                        display = ">{:{width}}<"
+                        color = curses.color_pair(MENU_CLR_SELECT)
+                    # put ^ or V on the top/bottom lines if there are more options but keep > on selected
+                    if i == topItem and topItem != 0:
+                        display = display[:len(display)-1]+"^"
+                    elif i == topItem+numVisibleItems-1 and i != numMenuItems-1:
+                        display = display[:len(display)-1]+"v"
+
+                    # format the line for display
+                    if i == selectedItem:
+                        display = display.format(menuItems.items[i][itemOffset:itemOffset+menuItems.width], width=menuItems.width)
+                    else:
+                        display = display.format(menuItems.items[i][:menuItems.width], width=menuItems.width)
+
+                    # show the item
+                    stdscr.addstr(line, menuItems.x, display, color)
+                    line += 1
+
+                # pad out the footer area, if there is one
+                while line < menuItems.y + numVisibleItems + numMenuFooters:
+                    stdscr.addstr(line, menuItems.x, " " * (2 + menuItems.width), curses.color_pair(MENU_CLR_FOOTER))
+                    line += 1
+
+                # display the footer if there is one
+                if menuItems.footer is not None:
+                    stdscr.addstr(line, menuItems.x, " " + menuItems.footer[footerOffset:footerOffset+menuItems.width], curses.color_pair(MENU_CLR_FOOTER))
+                    remain = footerLength-footerOffset
+                    while remain < menuItems.width:
+                        string = menuItems.footer[:menuItems.width-remain]
+                        stdscr.addstr(line, menuItems.x+1+remain, string, curses.color_pair(MENU_CLR_FOOTER))
+                        remain += len(string)
+                    stdscr.addstr(" ", curses.color_pair(MENU_CLR_FOOTER))
+
+                # make it all visible
+                stdscr.refresh()
 
-        if keyPressed:
+            # wait for a key, -1 if the time runs out first
             key = stdscr.getch()
+            if key == -1:
+                continue
+            redraw = True
             # this allows callbaks to "press keys"
             while key:
                 # cursor key up/down
@@ -309,161 +324,210 @@ def menu(menuItems):
                 # ignore all other keys
                 else:
                     break
-
-# backs up/restores the board, turn and score
+    finally:
+        # the rest of the game waits for keys
+        stdscr.timeout(-1)
+
+# backs up/restores the board, turn and score.  Each ply keeps only the square played, who played
+# it, the tiles it turned and who is to move next, with a whole board every
+# UNDO_CHECKPOINT plies.  Stepping back or forward a ply just turns those tiles over, and
+# any ply can be reached from the checkpoint before it in under UNDO_CHECKPOINT steps
 class UndoRedo:
     def __init__(self):
-        self.boardStack = []
-        self.attribStack = []
+        self.squares = array('b') # -1 where a board was saved that isn't 1 move on
+        self.movers = array('b') # colour index that played the square
+        self.flips = array('Q')
+        self.colours = array('b') # colour index to move after the ply
+        self.checkpoints = {} # ply: [white, black]
+        self.board = None # the board at ply curr
         self.curr = -1
         self.top = -1
 
     def save(self, board, colour, score):
-        while self.curr != self.top:
-            self.boardStack.pop()
-            self.attribStack.pop()
-            self.top -= 1;
-        self.boardStack.append(copy.deepcopy(board))
-        self.attribStack.append((colour, copy.copy(score)))
-        self.top += 1
-        self.curr = self.top
-
-    def setter(self, board, acolour, score):
-        for i in range(len(self.boardStack[self.curr])):
-            board[i] = copy.deepcopy(self.boardStack[self.curr][i])
-        acolour[0] = self.attribStack[self.curr][0]
-        score[0] = self.attribStack[self.curr][1][0]
-        score[1] = self.attribStack[self.curr][1][1]
+        # saving after an undo throws away the plies that could have been redone
+        if self.curr != self.top:
+            del self.squares[self.curr + 1:], self.movers[self.curr + 1:]
+            del self.flips[self.curr + 1:], self.colours[self.curr + 1:]
+            for ply in [ply for ply in self.checkpoints if ply > self.curr]:
+                del self.checkpoints[ply]
+            self.top = self.curr
+        ply = self.top + 1
+        placed = (board[0] | board[1]) & ~(self.board[0] | self.board[1]) if self.board else 0
+        mover = 0 if board[0] & placed else 1
+        flips = board[mover] & self.board[1 - mover] if self.board else 0
+        if placed and not placed & (placed - 1) and board[mover] == self.board[mover] | placed | flips and \
+                board[1 - mover] == self.board[1 - mover] ^ flips:
+            self.squares.append(placed.bit_length() - 1)
+        else:
+            # not a single move from the last board, so keep all of it
+            self.squares.append(-1)
+            mover, flips = 0, 0
+            self.checkpoints[ply] = list(board)
+        self.movers.append(mover)
+        self.flips.append(flips)
+        self.colours.append(colourIndex(colour))
+        if not ply % UNDO_CHECKPOINT:
+            self.checkpoints[ply] = list(board)
+        self.board = list(board)
+        self.top = self.curr = ply
+
+    # moves self.board from ply curr to ply curr + step, step being 1 or -1
+    def stepPly(self, step):
+        ply = self.curr + 1 if step > 0 else self.curr
+        bit, mover, flips = 1 << self.squares[ply], self.movers[ply], self.flips[ply]
+        self.board[mover] ^= bit | flips
+        self.board[1 - mover] ^= flips
+        self.curr += step
+
+    # goes to ply, putting its board, colour to move and score in board, acolour and score
+    def seek(self, ply, board, acolour, score):
+        ply = max(0, min(ply, self.top))
+        # start from the whole board before ply unless stepping from where we are is shorter.
+        # Plies that saved a whole board can't be stepped back over
+        checkpoint = max(p for p in self.checkpoints if p <= ply)
+        if self.curr < checkpoint or self.curr > ply and (self.curr - ply > ply - checkpoint or
+                                                          -1 in self.squares[ply + 1:self.curr + 1]):
+            self.board, self.curr = list(self.checkpoints[checkpoint]), checkpoint
+        while self.curr < ply:
+            self.stepPly(1)
+        while self.curr > ply:
+            self.stepPly(-1)
+        board[0], board[1] = self.board
+        acolour[0] = (WHITE, BLACK)[self.colours[ply]]
+        score[0], score[1] = popCount(board[0]), popCount(board[1])
+
+    # square numbers of the moves up to the current ply, or None if a board was saved that
+    # wasn't a move, so there's no move list from the start
+    def moves(self):
+        squares = self.squares[1:self.curr + 1]
+        return None if -1 in squares else list(squares)
 
     def undo(self, board, acolour, score):
         if self.curr != -1:
-            if self.curr > 0:
-                self.curr -= 1
-            self.setter(board, acolour, score)
+            self.seek(self.curr - 1, board, acolour, score)
 
     def redo(self, board, acolour, score):
         if self.curr < self.top:
-            self.curr += 1
-            self.setter(board, acolour, score)
-
-# the contents of each tile on the board
-class Tile:
-    contents = BLANK
-    score = 0
-
-# keeps track of x,y and potential score
-class Move:
-    y = x = -1
-    score = 0
-    def __init__(self, y=-1, x=-1, s=0):
-        self.y = y
-        self.x = x
-        self.score = s
-    def __lt__(self, rhs):
-        return self.score < rhs.score
-    def __repr__(self):
-        return "({},{},{})".format(self.y, self.x, self.score)
-
-# simply turn black->white or white->black
-def swap(colourIn):
-    if colourIn == BLACK:
-        return WHITE
-    return BLACK
-
-# walks a row/col/diag and counts piece that could be captured
-def traceTiles(y, x, dy, dx, board, colour):
-    score = 1
-    while y >= 0 and y < 8 and x >=0 and x < 8 and board[y][x].contents == colour:
-        y += dy
-        x += dx
-        score += 1
-    if y < 0 or y >= 8 or x < 0 or x >= 8 or board[y][x].contents == BLANK:
-        return 0
-    return score 
-
-# trace all neighbouts of a tile
-def scoreTile(y, x, board, colour):
-    other = swap(colour)
-    for y1 in range(y-1, y+2):
-        for x1 in range(x-1, x+2):
-            if y1 == -1 or x1 == -1 or y1 == 8 or x1 == 8 or (y1 == y and x1 == x):
-                continue
-            if board[y1][x1].contents == other:
-                dy, dx = y1-y, x1-x
-                board[y][x].score += traceTiles(y1+dy, x1+dx, dy, dx, board, other)
-
-# recursive scoring function and wide scoring test
-def scoreBoard(board, colour, move, level):
-    moveList = []
-    for y in range(8):
-        for x in range(8):
-            board[y][x].score = 0
-            if board[y][x].contents == BLANK:
-                scoreTile(y, x, board, colour)
-                if board[y][x].score:
-                    moveList.append(Move(y, x, board[y][x].score+advantage[y][x]))
-
-    if moveList:
-        moveList.sort()
-        best = Move()
-        tiles = 0
-        initBest = False
-        length = len(moveList)
-        length = max(1,int(length*(aiBreadth/5)))
-        moveList = moveList[-length:]
-        if level+1 > aiDepth:
-            move.__dict__ = moveList[-1].__dict__.copy()
-            tiles = move.score - advantage[move.y][move.x]
-        else:
-            aur = UndoRedo()
-            score = [0, 0]
-            aur.save(board, colour, score)
-            urc = [BLANK]
-            while moveList:
-                amove = moveList.pop()
-                addPiece(amove.y, amove.x, board, colour)
-                colour = swap(colour)
-                omove = Move()
-                scoreBoard(board, colour, omove, level+1)
-                if amove.score - omove.score > best.score or not initBest:
-                    best = copy.copy(amove)
-                    tiles = best.score - advantage[best.y][best.x]
-                    best.score -= omove.score
-                    initBest = True
-                aur.undo(board, urc, score) # reset
-                colour = swap(colour)
-            move.__dict__ = best.__dict__.copy()
-        if level == 0:
-            move.score = tiles
-    else:
+            self.seek(self.curr + 1, board, acolour, score)
+
+# seconds the AI can spend on this move, or 0 to search to Depth.  clock is what is left
+# of colour's time for the game, if the time setting is per game
+def getMoveTime(board, colour, clock):
+    label, perMove, perGame = TIME_SETTINGS[aiTime]
+    if perGame:
+        # share what's left over the moves this colour still has to make
+        movesLeft = max(2, (64 - popCount(board[0] | board[1]) + 1) // 2)
+        return max(0.05, clock[colourIndex(colour)] / movesLeft)
+    return perMove
+
+# runs the AI search for colour with the menu settings and fills in move like scoreBoard does
+def searchBoard(board, colour, move, timeLimit=0):
+    global aiStats
+    i = colourIndex(colour)
+    result = aiSearch.run(board, i, aiDepth + 1, aiBreadth, timeLimit)
+    aiStats = aiSearch.statusLine()
+    setMove(result, move)
+
+# fills in move from a Search.run result
+def setMove(result, move):
+    if result is None:
         move.y = -1
-
-# turns captured tiles (white->black or black->white)
-def setTraceTiles(y, x, dy, dx, board, colour):
-    score, ox, oy, other = 0, x, y, swap(colour)
-    while y >= 0 and y < 8 and x >=0 and x < 8 and board[y][x].contents == other:
-        y += dy
-        x += dx
-        score += 1
-    if y < 0 or y >= 8 or x < 0 or x >= 8 or board[y][x].contents == BLANK or score == 0:
         return
-    x, y = ox, oy
-    while y >= 0 and y < 8 and x >=0 and x < 8 and board[y][x].contents == other:
-        board[y][x].contents = colour
-        y += dy
-        x += dx
-
-# places a colour and sets neighbors/traces if captured
-def addPiece(y, x, board, colour):
-    board[y][x].contents = colour
-    other = swap(colour)
-    for y1 in range(y-1, y+2):
-        for x1 in range(x-1, x+2):
-            if y1 == -1 or x1 == -1 or y1 == 8 or x1 == 8 or (y1 == y and x1 == x):
-                continue
-            if board[y1][x1].contents == other:
-                dy, dx = y1-y, x1-x
-                setTraceTiles(y1, x1, dy, dx, board, colour)
+    score, sq, flips = result
+    move.y, move.x, move.score = sq >> 3, sq & 7, popCount(flips)
+
+# runs searchBoard in a thread so the keys still work while the AI thinks, showing its
+# progress under the score.  m stops it and plays the best move it has found so far.  ESC,
+# u and r stop it, drop its move and are returned so main handles them as it would for a
+# human.  Returns 0 when move has the AI's move in it
+def thinkBoard(board, colour, move, timeLimit=0):
+    global aiStats
+    aiSearch.stopped = False
+    thread = threading.Thread(target=searchBoard, args=(list(board), colour, move, timeLimit))
+    startTime = time.time()
+    thread.start()
+    key, tick = 0, 0
+    stdscr.timeout(int(THINK_POLL * 1000))
+    while thread.is_alive():
+        if not key:
+            aiStats = "{} Thinking  Depth {}  {} nodes  {:.1f}s  (m to move now)".format(
+                THINK_SPINNER[tick % len(THINK_SPINNER)], aiSearch.depth, aiSearch.nodes, time.time() - startTime)
+            drawStats()
+            stdscr.refresh()
+        tick += 1
+        ch = stdscr.getch()
+        if ch in INPUT_COMMAND and not key:
+            key = ch
+            aiSearch.stop()
+        elif ch == INPUT_MOVE_NOW:
+            aiSearch.stop()
+    thread.join()
+    stdscr.timeout(-1)
+    if key:
+        move.y = -1
+        aiStats = "Stopped"
+    return key
+
+# searches the AI's answer to the human's replies in a thread while the human thinks, the
+# reply a short search expects first and then the rest by tiles taken.  It has its own
+# Search, so its searches aren't logged or profiled as the AI's moves, but every one fills
+# the AI's transposition table, so even a reply it didn't get to is answered sooner
+class Ponder:
+    def __init__(self):
+        self.thread = None
+        self.stopping = False
+        # Search.run result and status line for each position searched, by key
+        self.results = {}
+
+    # the results key for board with the AI's colour to move, under the menu settings
+    def key(self, board, colour):
+        return board[0], board[1], colour, aiDepth, aiBreadth, aiTime
+
+    # starts pondering board, colour being the human's colour to move
+    def start(self, board, colour, clock):
+        self.stopping = False
+        self.results = {}
+        ponderSearch.stopped = False
+        self.thread = threading.Thread(target=self.run, args=(list(board), colour, list(clock)))
+        self.thread.start()
+
+    def run(self, board, colour, clock):
+        i = colourIndex(colour)
+        moves = getMoves(board[i], board[1 - i])
+        replies = sorted((sq for sq in range(64) if moves >> sq & 1),
+                         key=lambda sq: scoreTile(sq >> 3, sq & 7, board, colour), reverse=True)
+        if not replies:
+            return
+        guess = ponderSearch.run(board, i, min(aiDepth + 1, PONDER_PREDICT), aiBreadth)
+        replies.remove(guess[1])
+        replies.insert(0, guess[1])
+        for sq in replies:
+            if self.stopping:
+                return
+            after = list(board)
+            addPiece(sq >> 3, sq & 7, after, colour)
+            result = ponderSearch.run(after, 1 - i, aiDepth + 1, aiBreadth, getMoveTime(after, swap(colour), clock))
+            # a search cut short by stop isn't the one the AI would have made
+            if self.stopping:
+                return
+            self.results[self.key(after, swap(colour))] = result, ponderSearch.statusLine()
+
+    # stops pondering and waits for the thread to finish
+    def stop(self):
+        if self.thread is not None:
+            self.stopping = True
+            ponderSearch.stop()
+            self.thread.join()
+            self.thread = None
+
+    # (result, status line) of the pondered search of board with colour to move, or None
+    def take(self, board, colour):
+        return self.results.get(self.key(board, colour))
+
+# the AI's last search in a line under the score, blank until it has moved
+def drawStats():
+    y = max(0, int((screenY-(CELL_H*8))/2)-1)
+    stdscr.addstr(y, 0, "{:^{width}}".format(aiStats[:screenX - 1], width=screenX - 1), curses.color_pair(CR_BLUE_CYAN))
 
 # show score and who's turn and if it's human or AI
 def drawScore(score, colour, status):
@@ -476,28 +540,76 @@ def drawScore(score, colour, status):
     x -= int((len(wstring) + len(bstring) + 1) / 2)
     stdscr.addstr(y, x, bstring, curses.color_pair(CR_BLUE_CYAN if colour == WHITE else CR_BLACK_WHITE))
     stdscr.addstr(y, x + len(bstring) + 1, wstring, curses.color_pair(CR_BLUE_CYAN if colour == BLACK else CR_WHITE_BLUE))
+    drawStats()
 
-# draws the 8x8 board and pieces
-def drawBoard(board):
+# draws the 8x8 board and pieces.  hints, lines from Search.analyse, are numbered on their
+# squares best first and listed with their scores under the board
+def drawBoard(board, hints=None):
     y, x = int((screenY-(CELL_H*8))/2), int((screenX/2)-(CELL_W*8/2))
     y, x = max(0, y), max(0, x)
+    ranks = {line[1]: str(rank + 1) for rank, line in enumerate(hints or [])}
     for i in range(8):
         for j in range(8):
             stdscr.addstr(y+i*CELL_H, x+j*CELL_W, '[', curses.color_pair(CR_BLUE_CYAN))
-            c = board[i][j].contents
-            if c != BLANK and c != WHITE and c != BLACK:
-                stdscr.addstr(1,0,"c is messed up.  It's {} at ({},{})".format(c,i,j))
-                stdscr.refresh()
-                stdscr.getch()
+            c = contents(board, i, j)
             col = curses.color_pair(CR_WHITE_CYAN)
             if c != BLANK:
                  if c == BLACK:
                     col = curses.color_pair(CR_BLACK_CYAN)
                     c = WHITE
+            elif i * 8 + j in ranks:
+                c = ranks[i * 8 + j]
+                col = curses.color_pair(CR_RED_CYAN)
             stdscr.addstr(y+i*CELL_H, x+j*CELL_W+1, c, col)
             stdscr.addstr(']', curses.color_pair(CR_BLUE_CYAN))
+    text = ""
+    if hints:
+        text = "Hints  " + "  ".join("{} {} {}".format(rank + 1, squareName(sq >> 3, sq & 7), hintScore(score))
+                                     for rank, (score, sq, flips, exact, line) in enumerate(hints))
+    stdscr.addstr(y+CELL_H*8, 0, "{:^{width}}".format(text[:screenX - 1], width=screenX - 1), curses.color_pair(CR_BLUE_CYAN))
     stdscr.refresh()
 
+# a hint's score as shown: discs ahead, by the end of the game once it's solved
+def hintScore(score):
+    if hintSearch.evaluator is not None and not hintSearch.solved:
+        return "{:+.1f}".format(score / EVAL_DISC)
+    return "{:+d}".format(score)
+
+# the best HINT_MOVES moves for colour, for drawBoard
+def getHints(board, colour):
+    return hintSearch.analyse(board, colourIndex(colour), HINT_MOVES, HINT_DEPTH, 5)[:HINT_MOVES]
+
+# runs getHints in a thread so the cursor keys still work while the hints are worked out
+class Hints:
+    def __init__(self):
+        self.thread = None
+        self.lines = None
+
+    # starts the hints for board with colour to move
+    def start(self, board, colour):
+        self.stop()
+        hintSearch.stopped = False
+        self.thread = threading.Thread(target=self.run, args=(list(board), colour))
+        self.thread.start()
+
+    def run(self, board, colour):
+        self.lines = getHints(board, colour)
+
+    # the hints once they are ready, only the first time it's called after start, else None
+    def take(self):
+        if self.thread is None or self.thread.is_alive():
+            return None
+        self.thread.join()
+        self.thread = None
+        return self.lines
+
+    # drops the hints being worked out and waits for the thread to finish
+    def stop(self):
+        if self.thread is not None:
+            hintSearch.stop()
+            self.thread.join()
+            self.thread = None
+
 # shows a non-interactive screen
 def showMessage(message):
     stdscr.clear()
@@ -535,6 +647,8 @@ def drawHelp():
         "   ESC key     - Bring up the options menu",
         "   u           - Undo the last move",
         "   r           - Redo the next move (after undo)",
+        "   m           - Make the AI move now, while it thinks",
+        "   h           - Show or hide the best moves to play",
         "",
         "                                Press a key - Page 1/2",
         ""
@@ -543,19 +657,25 @@ def drawHelp():
         "",
         "                        Othello",
         "",
-        " In the settings menu are 2 AI options.  They do the  ",
+        " In the settings menu are 3 AI options.  They do the  ",
         " following:",
         "",
         " Depth   - 0 through 8.  Controls how many levels deep ",
         "   the AI will think.  A depth of 0 is the AIs next",
         "   move.  1 is the opponent's counter move, 2 is the",
-        "   AI counter to the counter, etc.  At level 8 and",
-        "   breadth 5 the game is very slow on my PC.",
+        "   AI counter to the counter, etc.",
         " Breadth - 0 through 5.  Controls how many moved per",
         "   level the AI will consider.  0 is only the move",
         "   that yields the most pieces.  1 is 1/5th of all",
         "   possible, moves, 2 is 2/5ths, etc. 5 is all",
         "   possible moves for all levels up to Depth.",
+        " Time    - Off, or a time limit per move or per game.",
+        "   The AI thinks 1 level deeper at a time until the",
+        "   time is up and Depth is not used.",
+        " Ponder  - On to let the AI think while you do, so it",
+        "   can answer the move it expected straight away.",
+        " Near the end of the game the AI plays perfectly,",
+        "   whatever the settings.",
         "",
         "                                Press a key - Page 2/2",
         ""
@@ -569,18 +689,44 @@ def drawGameOver():
     y, x = int((screenY-(CELL_H*8))/2)+CELL_H*8+1, int(screenX/2)-int(len(string) / 2)
     stdscr.addstr(y, x, string, curses.color_pair(CR_RED_CYAN))
 
-# move the cursor and on ENTER place a piece if it's a valid move
+# move the cursor and on ENTER place a piece if it's a valid move.  h turns the hints on
+# and off.  They are worked out in the background and drawn when they are ready
 def getHumanPlay(board, colour, move):
+    hints = Hints()
+    if showHints:
+        hints.start(board, colour)
+    try:
+        return getHumanKeys(board, colour, move, hints)
+    finally:
+        hints.stop()
+        stdscr.timeout(-1)
+
+# getHumanPlay's key loop
+def getHumanKeys(board, colour, move, hints):
+    global showHints
     y, x = int((screenY-(CELL_H*8))/2), int((screenX/2)-(CELL_W*8/2) + CELL_W / 2)
     y, x = max(0, y), max(0, x)
     cx = cy = 0
     move.y = -1
     while True:
         stdscr.addstr(y, x, "")
+        # wake up now and then to draw the hints while they are being worked out
+        stdscr.timeout(int(THINK_POLL * 1000) if hints.thread is not None else -1)
         key = stdscr.getch()
+        lines = hints.take()
+        if lines is not None:
+            drawBoard(board, lines)
+            stdscr.addstr(y, x, "")
         stdscr.refresh()
         if key in INPUT_COMMAND:
             return key
+        elif key == INPUT_HINT:
+            showHints = not showHints
+            if showHints:
+                hints.start(board, colour)
+            else:
+                hints.stop()
+                drawBoard(board)
         elif key == curses.KEY_LEFT:
             if cx > 0:
                 cx -= 1
@@ -597,13 +743,12 @@ def getHumanPlay(board, colour, move):
             if cy < 7:
                 cy += 1
                 y += CELL_H
-        elif key in INPUT_SELECT and board[cy][cx].contents == BLANK:
-                board[cy][cx].score = 0
-                scoreTile(cy, cx, board, colour)
-                if board[cy][cx].score > 0:
+        elif key in INPUT_SELECT:
+                tiles = scoreTile(cy, cx, board, colour)
+                if tiles > 0:
                     move.y = cy
                     move.x = cx
-                    move.score = board[cy][cx].score
+                    move.score = tiles
                     return curses.KEY_ENTER
 
 # choose menu options; out 0 = play, 1 = pass, 2 = end match, 3 = quit
@@ -614,11 +759,19 @@ def getUserChoice(status, inGame):
             if menuItems.aiBreadth > 5:
                 menuItems.aiBreadth = 0
             menuItems.items[1] = "Breadth: {}".format(menuItems.aiBreadth)
-        else:
+        elif selectedItem == 2:
             menuItems.aiDepth += 1
             if menuItems.aiDepth > 8:
                 menuItems.aiDepth = 0
             menuItems.items[2] = "Depth: {}".format(menuItems.aiDepth)
+        elif selectedItem == 3:
+            menuItems.aiTime += 1
+            if menuItems.aiTime >= len(TIME_SETTINGS):
+                menuItems.aiTime = 0
+            menuItems.items[3] = "Time: {}".format(TIME_SETTINGS[menuItems.aiTime][0])
+        else:
+            menuItems.aiPonder = not menuItems.aiPonder
+            menuItems.items[4] = "Ponder: {}".format("On" if menuItems.aiPonder else "Off")
 
     while True:
         stdscr.clear()
@@ -660,21 +813,26 @@ def getUserChoice(status, inGame):
             status[0] = status[1] = 1
             return 0
         elif option == 3:
-            global aiBreadth, aiDepth
+            global aiBreadth, aiDepth, aiTime, aiPonder
             while option > 0:
                 menuItems = MenuItems(
                     title = "Accept Settings",
-                    items = ["Play with these settings", "Breadth: {}".format(aiBreadth), "Depth: {}".format(aiDepth)],
+                    items = ["Play with these settings", "Breadth: {}".format(aiBreadth), "Depth: {}".format(aiDepth),
+                             "Time: {}".format(TIME_SETTINGS[aiTime][0]), "Ponder: {}".format("On" if aiPonder else "Off")],
                     footer = "***** See Help for an explanation of these values ",
-                    callbacks = [None, upvar, upvar]
+                    callbacks = [None, upvar, upvar, upvar, upvar]
                     )
                 menuItems.aiBreadth = aiBreadth
                 menuItems.aiDepth = aiDepth
+                menuItems.aiTime = aiTime
+                menuItems.aiPonder = aiPonder
                 option = menu(menuItems)
                 stdscr.clear()
                 if option == 0:
                     aiBreadth = menuItems.aiBreadth
                     aiDepth = menuItems.aiDepth
+                    aiTime = menuItems.aiTime
+                    aiPonder = menuItems.aiPonder
 
         elif option == 4:
             drawHelp()
@@ -716,37 +874,46 @@ def initScr(win):
     stdscr.clear()
     screenY, screenX = stdscr.getmaxyx()
 
-# fills in the "advantage" grid and calls initScr
-def init(win):
-    global advantage, aiBreadth, aiDepth
-    advantage = [
-        [8, 0, 3, 2, 2, 3, 0, 8],
-        [0, 0, 2, 0, 0, 2, 0, 0],
-        [3, 2, 4, 3, 3, 4, 2, 3],
-        [2, 0, 3, 0, 0, 3, 0, 2],
-        [2, 0, 3, 0, 0, 3, 0, 2],
-        [3, 2, 4, 3, 3, 4, 2, 3],
-        [0, 0, 2, 0, 0, 2, 0, 0],
-        [8, 0, 3, 2, 2, 3, 0, 8],
-    ]
+# sets the AI defaults and calls initScr
+def init(win, options):
+    global aiBreadth, aiDepth, aiTime, aiPonder, aiSearch, aiStats, hintSearch, ponderSearch, showHints
+    aiSearch = Search(options.tt_mb, options.workers, options.endgame)
+    # pondering has the human's thinking time, so it does without a pool of its own
+    ponderSearch = Search(options.tt_mb, endgameEmpties=options.endgame)
+    ponderSearch.table = aiSearch.table
+    hintSearch = Search(HINT_TT_MB, endgameEmpties=options.endgame)
+    hintSearch.evaluator = options.evaluator
+    aiSearch.book = options.openingBook
+    aiSearch.evaluator = options.evaluator
+    ponderSearch.book = options.openingBook
+    ponderSearch.evaluator = options.evaluator
+    aiSearch.log = options.searchLog
+    if options.profile:
+        import cProfile
+        aiSearch.profile = cProfile.Profile()
+    aiStats = ""
     aiBreadth = 0
     aiDepth = 0
+    aiTime = 0
+    aiPonder = False
+    showHints = False
 
     initScr(win)
 
 # called from the curses.wrapper - main game loop
-def main(win):
+def main(win, options):
+    global aiStats
 
-    init(win)
+    init(win, options)
+    ponder = Ponder()
 
     quit = False
 
     while not quit:
-        board = [[Tile() for x in range(8)] for y in range(8)] # [8][8] matrix
-        board[3][3].contents = board[4][4].contents = WHITE
-        board[3][4].contents = board[4][3].contents = BLACK
+        board = [START_WHITE, START_BLACK] # [white, black] bitboards
         gameOver, key, colour, score, status, urc = 0, 0, BLACK, [2, 2], [0, 0], [BLANK]
         move = Move()
+        clock = [TIME_SETTINGS[aiTime][2]] * 2 # game time left for [white, black]
 
         ur = UndoRedo()
         ur.save(board, colour, score)
@@ -759,11 +926,22 @@ def main(win):
             drawBoard(board)
 
             if status[ 0 if colour == WHITE else 1]:
-                if status[0] == status[1] == 1:
-                    key = stdscr.getch()
-                scoreBoard(board, colour, move, 0)
+                # with 2 AIs wait for a key between moves, which could be ESC, u or r
+                key = stdscr.getch() if status[0] == status[1] == 1 else 0
+                pondered = ponder.take(board, colour)
+                if key not in INPUT_COMMAND and pondered:
+                    # the human played a reply the AI had already searched
+                    setMove(pondered[0], move)
+                    aiStats = "Pondered  " + pondered[1]
+                elif key not in INPUT_COMMAND:
+                    startTime = time.time()
+                    key = thinkBoard(board, colour, move, getMoveTime(board, colour, clock))
+                    clock[colourIndex(colour)] -= time.time() - startTime
             else:
+                if aiPonder and status[0] != status[1]:
+                    ponder.start(board, colour, clock)
                 key = getHumanPlay(board, colour, move)
+                ponder.stop()
 
             if key == INPUT_BACKUP:
                 key = getUserChoice(status, True)
@@ -813,7 +991,60 @@ def main(win):
         else:
             drawScore(score, BLANK, status)
             drawGameOver()
+            moves = ur.moves()
+            if options.record and moves is not None:
+                with GameWriter(options.record, append=True) as writer:
+                    writer.write(moves)
             stdscr.getch()
 
-# inits the terminal, calls the game and cleans up the terminal again
-curses.wrapper(main)
+# reads the command line, inits the terminal, calls the game and cleans up the terminal again
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Othello, using curses")
+    parser.add_argument("--tt-mb", type=int, default=TT_DEFAULT_MB,
+                        help="memory for the AI transposition table in MB (default {})".format(TT_DEFAULT_MB))
+    parser.add_argument("--tt-stats", action="store_true",
+                        help="print transposition table use and hit rate on exit")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes the AI searches with (default 1)")
+    parser.add_argument("--endgame", type=int, default=ENDGAME_EMPTIES,
+                        help="empty squares left when the AI starts playing perfectly (default {}, 0 never)".format(ENDGAME_EMPTIES))
+    parser.add_argument("--book", default=None,
+                        help="opening book file made by book.py (default {} next to this file, if there is one)".format(BOOK_DEFAULT_FILE))
+    parser.add_argument("--no-book", action="store_true", help="don't use an opening book")
+    parser.add_argument("--weights", default=None,
+                        help="pattern evaluation weights made by pattern.py (default {} next to this file, if there is one)".format(WEIGHTS_DEFAULT_FILE))
+    parser.add_argument("--no-weights", action="store_true", help="count captured pieces instead of using pattern evaluation")
+    parser.add_argument("--record", default=None,
+                        help="file to add finished games to, .wtb or text like f5d6c3 (default none)")
+    parser.add_argument("--search-log", default=None,
+                        help="file to add a JSON line of AI search stats to after every AI move")
+    parser.add_argument("--profile", default=None,
+                        help="profile the AI and save the stats to this file, printing the slowest functions on exit")
+    options = parser.parse_args()
+    # open the book now so a bad --book is reported before curses takes over the screen
+    options.openingBook = None
+    bookPath = options.book or os.path.join(os.path.dirname(os.path.abspath(__file__)), BOOK_DEFAULT_FILE)
+    if not options.no_book and (options.book or os.path.exists(bookPath)):
+        try:
+            options.openingBook = OpeningBook(bookPath)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    try:
+        options.evaluator = loadEvaluator(options.weights, options.no_weights)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    options.searchLog = open(options.search_log, "a") if options.search_log else None
+    curses.wrapper(main, options)
+    aiSearch.close()
+    if options.searchLog:
+        options.searchLog.close()
+    if options.profile:
+        aiSearch.profile.dump_stats(options.profile)
+        import pstats
+        pstats.Stats(aiSearch.profile).sort_stats("tottime").print_stats(15)
+    if options.tt_stats:
+        print("Transposition table: {}".format(aiSearch.table))
+        if options.openingBook is not None:
+            print("Opening book: {}".format(options.openingBook))
+    if options.openingBook is not None:
+        options.openingBook.close()
@@ -0,0 +1,343 @@
+"""
+Othello pattern evaluation.  A position is scored from lines and blocks of squares
+(patterns): the edges with their X squares, the corner 3x3 and 2x5 blocks and the
+diagonals.  The contents of each pattern, empty, own or other on every square, make a base
+3 number that indexes a table of learned weights.  Each pattern is looked for in all
+the places its mirror images fit, and all of them share one table.  Contents that a
+mirror image turns into other contents of the same place share a weight too, so all 8
+mirror images of a position score the same.  Added to that are mobility (moves own has
+less moves other has) and potential mobility (empty squares next to other's pieces less
+those next to own's).  The game is split into STAGES by the number of pieces on the
+board and each stage has its own weights.
+
+The weights are learned from games and saved in a weights file: a header then the
+weights of every stage as zlib compressed int16s.  Run this file to make one from game
+files that records.py reads and from NumPy self-play games:
+
+    python pattern.py othello.weights --games games.wtb --self-play 20000
+
+Scores are in engine.EVAL_DISC units a disc.  Set a Search's evaluator to a
+PatternEval to have it search with this instead of counting captures.
+"""
+
+import os
+import sys
+import zlib
+import struct
+from array import array
+import engine
+import records
+
+WEIGHTS_MAGIC       = b"OTHPAT02"
+WEIGHTS_HEADER      = struct.Struct("<8sHI") # magic, stages, weights a stage
+WEIGHTS_DEFAULT_FILE = "othello.weights"
+STAGES              = 4 # game stages by number of pieces, each with its own weights
+NOT_A_FILE          = 0xFEFEFEFEFEFEFEFE # every square but the a file (x == 0)
+NOT_H_FILE          = 0x7F7F7F7F7F7F7F7F # every square but the h file (x == 7)
+# squares of each pattern in the order of its base 3 digits, as it lies in the a1 corner.
+# The other places it is looked for are its mirror images
+PATTERN_SHAPES      = [
+    ("edge2x",    [0, 1, 2, 3, 4, 5, 6, 7, 9, 14]),
+    ("corner3x3", [0, 1, 2, 8, 9, 10, 16, 17, 18]),
+    ("corner2x5", [0, 1, 2, 3, 4, 8, 9, 10, 11, 12]),
+    ("diag8",     [0, 9, 18, 27, 36, 45, 54, 63]),
+    ("diag7",     [1, 10, 19, 28, 37, 46, 55]),
+    ("diag6",     [2, 11, 20, 29, 38, 47]),
+    ("diag5",     [3, 12, 21, 30, 39]),
+    ("diag4",     [4, 13, 22, 31]),
+]
+# stage of the game by the number of pieces on the board
+stageOf = [min(STAGES - 1, max(0, discs - 4) * STAGES // 61) for discs in range(65)]
+
+# every place each pattern fits: (shape name, squares in digit order)
+def patternInstances():
+    instances = []
+    for name, base in PATTERN_SHAPES:
+        seen = set()
+        for t in range(8):
+            squares = [engine.symmetrySq[t][sq] for sq in base]
+            if frozenset(squares) not in seen:
+                seen.add(frozenset(squares))
+                instances.append((name, squares))
+    return instances
+
+# bitboards turned so each diagonal lies in 1 byte (with a shorter one wrapped around in
+# the rest of it), for a1-h8 and h1-a8 diagonals.  Pseudo-rotation by 45 degrees
+def rotateRight(bits, n):
+    return ((bits >> n) | (bits << (64 - n))) & engine.FULL_BOARD
+
+def rotate45(bits, k1, k2, k4):
+    bits ^= k1 & (bits ^ rotateRight(bits, 8))
+    bits ^= k2 & (bits ^ rotateRight(bits, 16))
+    bits ^= k4 & (bits ^ rotateRight(bits, 32))
+    return bits
+
+def rotate45Clockwise(bits):
+    return rotate45(bits, 0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0)
+
+def rotate45AntiClockwise(bits):
+    return rotate45(bits, 0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F)
+
+# the ways evaluate looks at a bitboard.  Byte b of view v is slot v * 8 + b
+VIEWS               = [lambda bits: bits, engine.flipDiagonal, rotate45Clockwise, rotate45AntiClockwise]
+# (slot, bit) each square ends up at in each view
+viewBits            = [[divmod(view(1 << sq).bit_length() - 1, 8) for sq in range(64)] for view in VIEWS]
+
+# the squares of an instance split by the slots they are read from, as
+# [(slot, [(bit, digit)])], from whichever view needs the fewest slots.  Rows win ties
+def instanceGroups(squares):
+    options = []
+    for v in range(len(VIEWS)):
+        groups = {}
+        for digit, sq in enumerate(squares):
+            byte, bit = viewBits[v][sq]
+            groups.setdefault(v * 8 + byte, []).append((bit, digit))
+        options.append(groups)
+    return sorted(min(options, key=len).items())
+
+class PatternEval:
+    def __init__(self, path=None):
+        self.path = path
+        self.instances = patternInstances()
+        # table offsets of each shape in a stage's weights
+        self.offsets = {}
+        size = 0
+        for name, base in PATTERN_SHAPES:
+            self.offsets[name] = size
+            size += 3 ** len(base)
+        self.mobilityIndex, self.potentialIndex = size, size + 1
+        self.size = size + 2
+        # (offset, [(slot, table)]) for every instance.  table[byte] is the base 3 value
+        # of own having the pieces in byte on the instance's squares in that slot
+        self.tables = []
+        for name, squares in self.instances:
+            groups = []
+            for slot, members in instanceGroups(squares):
+                values = [0] * 8
+                for bit, digit in members:
+                    values[bit] = 3 ** digit
+                # each byte's value is the one without its lowest bit plus that bit's
+                table = array("i", bytes(4 * 256))
+                for byte in range(1, 256):
+                    low = byte & -byte
+                    table[byte] = table[byte ^ low] + values[low.bit_length() - 1]
+                groups.append((slot, table))
+            self.tables.append((self.offsets[name], groups))
+        self.weights = [array("h", bytes(2 * self.size)) for stage in range(STAGES)]
+        if path is not None:
+            self.load(path)
+
+    # symmetric[i] is the weight index that weights[i] has to equal.  Some patterns land on
+    # the same squares in a mirror image of the position, with their digits in another order,
+    # and the contents they see there must score the same for all 8 mirror images to score
+    # the same.  Each index maps to the lowest of those it can become that way
+    def symmetricIndex(self):
+        symmetric = array("i", range(self.size))
+        for name, base in PATTERN_SHAPES:
+            offset = self.offsets[name]
+            for t in range(1, 8):
+                moved = [engine.symmetrySq[t][sq] for sq in base]
+                if moved == base or set(moved) != set(base):
+                    continue
+                # digit d of an index is digit perm[d] in the mirror image
+                perm = [base.index(sq) for sq in moved]
+                mirrored = [0]
+                for d in range(len(base)):
+                    step = 3 ** perm[d]
+                    mirrored = [index + digit * step for digit in range(3) for index in mirrored]
+                for index, other in enumerate(mirrored):
+                    symmetric[offset + index] = min(symmetric[offset + index], offset + other)
+        return symmetric
+
+    def __repr__(self):
+        return "{} patterns in {} tables, {} weights a stage".format(len(self.instances), len(PATTERN_SHAPES), self.size)
+
+    # the weights from a file written by save.  Raises ValueError if it isn't one
+    def load(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < WEIGHTS_HEADER.size:
+            raise ValueError("{} is not a weights file".format(path))
+        magic, stages, size = WEIGHTS_HEADER.unpack_from(data)
+        if magic != WEIGHTS_MAGIC or stages != STAGES or size != self.size:
+            raise ValueError("{} is not a weights file for these patterns".format(path))
+        try:
+            weights = array("h", zlib.decompress(data[WEIGHTS_HEADER.size:]))
+        except zlib.error:
+            raise ValueError("{} is damaged".format(path))
+        if len(weights) != stages * size:
+            raise ValueError("{} is damaged".format(path))
+        if sys.byteorder == "big":
+            weights.byteswap()
+        self.weights = [weights[stage * size:(stage + 1) * size] for stage in range(stages)]
+        self.path = path
+
+    def save(self, path):
+        weights = array("h")
+        for stage in self.weights:
+            weights.extend(stage)
+        if sys.byteorder == "big":
+            weights.byteswap()
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(WEIGHTS_HEADER.pack(WEIGHTS_MAGIC, STAGES, self.size))
+            f.write(zlib.compress(weights.tobytes(), 9))
+        os.replace(temp, path)
+
+    # the bytes of bits for every slot
+    def slots(self, bits):
+        return (bits.to_bytes(8, "little") + engine.flipDiagonal(bits).to_bytes(8, "little") +
+                rotate45Clockwise(bits).to_bytes(8, "little") + rotate45AntiClockwise(bits).to_bytes(8, "little"))
+
+    # (stage, index into the stage's weights for every instance, mobility, potential
+    # mobility) of own to move.  Pass symmetric, from symmetricIndex, for the indexes of the
+    # weights they share their values with
+    def features(self, own, other, symmetric=None):
+        o, t = self.slots(own), self.slots(other)
+        indexes = []
+        for offset, groups in self.tables:
+            index = offset
+            for slot, table in groups:
+                index += table[o[slot]] + 2 * table[t[slot]]
+            indexes.append(index if symmetric is None else symmetric[index])
+        mobility = engine.popCount(engine.getMoves(own, other)) - engine.popCount(engine.getMoves(other, own))
+        empty = ~(own | other) & engine.FULL_BOARD
+        potential = engine.popCount(neighbours(other) & empty) - engine.popCount(neighbours(own) & empty)
+        return stageOf[engine.popCount(own | other)], indexes, mobility, potential
+
+    # the score of own to move, in engine.EVAL_DISC units a disc
+    def evaluate(self, own, other):
+        weights = self.weights[stageOf[engine.popCount(own | other)]]
+        o, t = self.slots(own), self.slots(other)
+        score = 0
+        for offset, groups in self.tables:
+            index = offset
+            for slot, table in groups:
+                index += table[o[slot]] + 2 * table[t[slot]]
+            score += weights[index]
+        mobility = engine.popCount(engine.getMoves(own, other)) - engine.popCount(engine.getMoves(other, own))
+        empty = ~(own | other) & engine.FULL_BOARD
+        potential = engine.popCount(neighbours(other) & empty) - engine.popCount(neighbours(own) & empty)
+        return score + weights[self.mobilityIndex] * mobility + weights[self.potentialIndex] * potential
+
+# the PatternEval for the --weights and --no-weights options: path, or WEIGHTS_DEFAULT_FILE
+# next to this file if path is None and there is one.  None for noWeights or no weights
+# file.  Raises OSError or ValueError for a file that can't be read
+def loadEvaluator(path=None, noWeights=False):
+    weightsPath = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), WEIGHTS_DEFAULT_FILE)
+    if noWeights or not (path or os.path.exists(weightsPath)):
+        return None
+    return PatternEval(weightsPath)
+
+# the squares next to any of bits.  Pieces on the a file have no neighbours to their left
+# and ones on the h file none to their right
+def neighbours(bits):
+    notA, notH = bits & NOT_A_FILE, bits & NOT_H_FILE
+    result = (bits << 8) | (bits >> 8) | (notH << 1) | (notA >> 1) | (notA << 7) | (notH >> 7) | (notH << 9) | (notA >> 9)
+    return result & engine.FULL_BOARD
+
+# (own, other, label) for every position of every game, where label is own's final disc
+# difference (engine.finalScore) when own is to move
+def gameSamples(games):
+    for moves in games:
+        positions = []
+        board = None
+        for board, side, sq, flips in records.replay(moves):
+            positions.append((board, side))
+            board = list(board)
+            board[side] |= (1 << sq) | flips
+            board[1 - side] ^= flips
+        if board is None:
+            continue
+        for position, side in positions:
+            yield position[side], position[1 - side], engine.finalScore(board[side], board[1 - side])
+
+# count games, as lists of square numbers, of the NumPy greedy player with a random move a
+# randomness of the time so the games spread out
+def selfPlayGames(count, randomness, seed=None):
+    import numpy as np
+    import selfplay
+    rng = np.random.default_rng(seed)
+
+    def _policy(own, other, moves, rng):
+        greedy = selfplay.greedyPolicy(own, other, moves, rng)
+        return np.where(rng.random(len(own)) < randomness, selfplay.randomPolicy(own, other, moves, rng), greedy)
+
+    for start in range(0, count, 10000):
+        games = selfplay.Games(min(10000, count - start))
+        games.play([_policy, _policy], rng)
+        for i in range(len(games)):
+            yield games.record(i).moves
+
+# fits evaluator's weights to samples, (own, other, label) tuples, by least squares.  Each
+# weight takes its share of the error of the positions it is in, divided by how many it is
+# in, so rare patterns don't swing about.  Weights that have to be equal (see
+# symmetricIndex) are learned as one.  Returns the mean absolute error in discs of each stage
+def train(evaluator, samples, epochs, report=None):
+    import numpy as np
+    symmetric = evaluator.symmetricIndex()
+    stages, indexes, extras, labels = [], [], [], []
+    for own, other, label in samples:
+        stage, index, mobility, potential = evaluator.features(own, other, symmetric)
+        stages.append(stage)
+        indexes.append(index)
+        extras.append((mobility, potential))
+        labels.append(label * engine.EVAL_DISC)
+    stages, indexes = np.array(stages), np.array(indexes, np.int32)
+    extras, labels = np.array(extras, np.float64), np.array(labels, np.float64)
+    errors = []
+    for stage in range(STAGES):
+        mine = stages == stage
+        index, extra, label = indexes[mine], extras[mine], labels[mine]
+        if not len(label):
+            errors.append(None)
+            continue
+        weights = np.zeros(evaluator.size)
+        counts = np.bincount(index.ravel(), minlength=evaluator.size)
+        scale = 1 / np.maximum(counts, 1)
+        extraScale = 1 / np.maximum((extra ** 2).sum(axis=0), 1)
+        for epoch in range(epochs):
+            error = label - weights[index].sum(axis=1) - extra @ weights[-2:]
+            share = np.bincount(index.ravel(), np.repeat(error / index.shape[1], index.shape[1]), evaluator.size)
+            weights += share * scale
+            weights[-2:] += (extra * error[:, None]).sum(axis=0) * extraScale
+            if report:
+                report(stage, epoch, np.abs(error).mean() / engine.EVAL_DISC)
+        error = label - weights[index].sum(axis=1) - extra @ weights[-2:]
+        errors.append(np.abs(error).mean() / engine.EVAL_DISC)
+        weights = weights[np.frombuffer(symmetric, np.int32)]
+        evaluator.weights[stage] = array("h", np.clip(np.rint(weights), -32767, 32767).astype(np.int16).tobytes())
+    return errors
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Learn Othello pattern evaluation weights from games")
+    parser.add_argument("weights", nargs="?", default=WEIGHTS_DEFAULT_FILE,
+                        help="weights file to write (default {})".format(WEIGHTS_DEFAULT_FILE))
+    parser.add_argument("--games", action="append", default=[],
+                        help="file of games, .wtb or one per line like f5d6c3d3 (can be given more than once)")
+    parser.add_argument("--self-play", type=int, default=0, help="number of NumPy self-play games to add")
+    parser.add_argument("--randomness", type=float, default=0.3,
+                        help="chance of a random move at each ply of a self-play game (default 0.3)")
+    parser.add_argument("--epochs", type=int, default=30, help="passes over the positions (default 30)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the self-play games")
+    options = parser.parse_args()
+    if not options.games and not options.self_play:
+        parser.error("give --games or --self-play to learn from")
+
+    def _games():
+        for path in options.games:
+            for game in records.readGames(path):
+                yield game.moves
+        if options.self_play:
+            yield from selfPlayGames(options.self_play, options.randomness, options.seed)
+
+    evaluator = PatternEval()
+    errors = train(evaluator, gameSamples(_games()), options.epochs)
+    evaluator.save(options.weights)
+    for stage, error in enumerate(errors):
+        print("stage {}: {}".format(stage, "no positions" if error is None else "mean error {:.2f} discs".format(error)))
+    print("{}: {}".format(options.weights, evaluator))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Othello game records, read and written a game at a time so files of any size can be
+worked through in constant memory.  Two formats, picked by the file extension:
+
+    .wtb          - WTHOR database files.  A 16 byte header then 68 bytes a game: tournament,
+                    black and white player numbers, black's discs at the end, the theoretical
+                    score and 60 moves as row*10+column (1-8 each), 0 after the last move
+    anything else - text, one game a line like "f5d6c3d3c4".  Blank lines and lines
+                    starting with # are skipped
+
+    for game in records.readGames("games.wtb"):
+        for board, side, sq, flips in records.replay(game.moves):
+            ...
+"""
+
+import os
+import time
+import struct
+import engine
+
+WTB_HEADER          = struct.Struct("<4BIHHBBBB") # century, year, month, day, games, count2, year, size, solitaire, depth, spare
+WTB_GAME            = struct.Struct("<HHHBB60s") # tournament, black, white, black's discs, theoretical, moves
+WTB_CHUNK           = 1024 # games read from a .wtb file at a time
+
+class GameRecord:
+    def __init__(self, moves, blackScore=None, theoreticalScore=None, tournament=0, blackPlayer=0, whitePlayer=0, year=0):
+        self.moves = moves # square numbers, y*8+x.  Passes aren't in the list
+        self.blackScore = blackScore # black's discs at the end, if known
+        self.theoreticalScore = theoreticalScore
+        self.tournament = tournament
+        self.blackPlayer = blackPlayer
+        self.whitePlayer = whitePlayer
+        self.year = year
+
+    def __repr__(self):
+        return self.text()
+
+    # the moves like "f5d6c3"
+    def text(self):
+        return "".join(engine.squareName(sq >> 3, sq & 7) for sq in self.moves)
+
+# square numbers from text like "f5d6c3".  Raises ValueError if it isn't squares
+def parseMoves(text):
+    return [y * 8 + x for y, x in (engine.parseSquare(text[i:i + 2]) for i in range(0, len(text), 2))]
+
+def isWtb(path):
+    return path.lower().endswith(".wtb")
+
+# GameRecords from the text file at path, a line at a time
+def readText(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip().replace(" ", "")
+            if line and not line.startswith("#"):
+                yield GameRecord(parseMoves(line))
+
+# GameRecords from the WTHOR file at path, read WTB_CHUNK games at a time
+def readWtb(path):
+    with open(path, "rb") as f:
+        header = f.read(WTB_HEADER.size)
+        if len(header) < WTB_HEADER.size:
+            raise ValueError("{} is too short to be a WTHOR file".format(path))
+        fields = WTB_HEADER.unpack(header)
+        count, year, size = fields[4], fields[6], fields[7]
+        if size not in (0, 8):
+            raise ValueError("{} is for a {}x{} board".format(path, size, size))
+        while count:
+            data = f.read(WTB_GAME.size * min(count, WTB_CHUNK))
+            games = len(data) // WTB_GAME.size
+            if not games:
+                raise ValueError("{} ends {} games early".format(path, count))
+            for tournament, black, white, score, theoretical, moves in WTB_GAME.iter_unpack(data[:games * WTB_GAME.size]):
+                squares = [(move // 10 - 1) * 8 + move % 10 - 1 for move in moves if move]
+                yield GameRecord(squares, score, theoretical, tournament, black, white, year)
+            count -= games
+
+# GameRecords from path in the format its extension says
+def readGames(path):
+    return readWtb(path) if isWtb(path) else readText(path)
+
+# (board, side, square, flips) for every move of a game: the [white, black] board before
+# the move, the colour index playing, where and the tiles it turns.  A colour with no move
+# passes on its own, and a move that isn't legal raises ValueError
+def replay(moves):
+    board, side = [engine.START_WHITE, engine.START_BLACK], 1
+    for sq in moves:
+        own, other = board[side], board[1 - side]
+        if not engine.getMoves(own, other):
+            side = 1 - side
+            own, other = other, own
+        flips = engine.getFlips(sq, own, other) if not (own | other) >> sq & 1 else 0
+        if not flips:
+            raise ValueError("{} is not a legal move".format(engine.squareName(sq >> 3, sq & 7)))
+        yield board, side, sq, flips
+        board = list(board)
+        board[side] = own | (1 << sq) | flips
+        board[1 - side] = other ^ flips
+        side = 1 - side
+
+# the [white, black] board at the end of moves
+def finalBoard(moves):
+    board = [engine.START_WHITE, engine.START_BLACK]
+    for before, side, sq, flips in replay(moves):
+        board = list(before)
+        board[side] |= (1 << sq) | flips
+        board[1 - side] ^= flips
+    return board
+
+# writes games to path a game at a time, in the format its extension says.  With append
+# the games go on the end of any that are there already
+class GameWriter:
+    def __init__(self, path, year=None, append=False):
+        self.path = path
+        self.wtb = isWtb(path)
+        self.year = time.localtime().tm_year if year is None else year
+        self.count = 0
+        if not (append and os.path.exists(path)):
+            self.file = open(path, "wb" if self.wtb else "w")
+            if self.wtb:
+                # the game count is filled in by close
+                self.file.write(bytes(WTB_HEADER.size))
+        elif self.wtb:
+            self.file = open(path, "r+b")
+            fields = WTB_HEADER.unpack(self.file.read(WTB_HEADER.size))
+            self.count, self.year = fields[4], fields[6] or self.year
+            self.file.seek(WTB_HEADER.size + self.count * WTB_GAME.size)
+            self.file.truncate()
+        else:
+            self.file = open(path, "a")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    # game is a GameRecord or a list of square numbers
+    def write(self, game):
+        if not isinstance(game, GameRecord):
+            game = GameRecord(list(game))
+        if self.wtb:
+            score = game.blackScore
+            if score is None:
+                score = engine.popCount(finalBoard(game.moves)[1])
+            theoretical = score if game.theoreticalScore is None else game.theoreticalScore
+            moves = bytes((sq >> 3) * 10 + (sq & 7) + 11 for sq in game.moves).ljust(60, b"\0")
+            self.file.write(WTB_GAME.pack(game.tournament, game.blackPlayer, game.whitePlayer, score, theoretical, moves))
+        else:
+            self.file.write(game.text() + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.wtb and not self.file.closed:
+            today = time.localtime()
+            self.file.seek(0)
+            self.file.write(WTB_HEADER.pack(today.tm_year // 100, today.tm_year % 100, today.tm_mon, today.tm_mday,
+                                            self.count, 0, self.year, 8, 0, 0, 0))
+        self.file.close()
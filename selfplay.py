@@ -0,0 +1,164 @@
+"""
+Othello self-play without the curses game, for tuning and test data.  Games holds
+thousands of games as NumPy arrays and plays them all a move at a time, so the work per
+move is a handful of array operations whatever the number of games.  Each colour's moves
+come from a policy, a function that picks 1 move for every game at once:
+
+    policy(own, other, moves, rng) -> square numbers
+
+own, other and moves are uint64 bitboard arrays for the games with a move to make and rng
+is a numpy Generator.  randomPolicy and greedyPolicy are here; greedy plays like the AI
+at Depth 0.  Run this file to play a match:
+
+    python selfplay.py --games 10000 --black greedy --white random
+"""
+
+import time
+import argparse
+import numpy as np
+import engine
+import batch
+import records
+
+MAX_PLIES           = 60 # moves in the longest game, passes not counted
+
+# a random legal move in every game
+def randomPolicy(own, other, moves, rng):
+    counts = batch.popCounts(moves)
+    pick = rng.integers(0, counts)
+    # the square of the pick'th set bit
+    return (np.cumsum(batch.unpackBits(moves), axis=1) > pick[:, None]).argmax(axis=1)
+
+# the move that captures the most plus the advantage table, as Search plays at depth 1.
+# Ties go to the higher square number, the same as Search
+def greedyPolicy(own, other, moves, rng):
+    counts = batch.captureCounts(own, other)
+    scores = np.where(counts > 0, counts + batch.ADVANTAGE, -1)
+    return 63 - scores[:, ::-1].argmax(axis=1)
+
+POLICIES            = {"random": randomPolicy, "greedy": greedyPolicy}
+
+# the pieces of other turned by own playing the single bit in each of bits.  Each
+# direction floods out from the new piece through other's pieces and keeps the flood if
+# own's piece is at the end of it
+def flipBits(bits, own, other):
+    flips = np.zeros_like(own)
+    for shift, mask in batch.DIRECTIONS:
+        inner = other & mask
+        for step in (lambda bits: bits << shift, lambda bits: bits >> shift):
+            flood = step(bits) & inner
+            for i in range(batch.MAX_RUN - 1):
+                flood |= step(flood) & inner
+            flips |= np.where(step(flood) & own, flood, np.uint64(0))
+    return flips
+
+class Games:
+    def __init__(self, count):
+        self.boards = np.empty((count, 2), np.uint64)
+        self.boards[:, 0] = engine.START_WHITE
+        self.boards[:, 1] = engine.START_BLACK
+        # colour index to move, and passes in a row like main's gameOver, 2 ends the game
+        self.side = np.ones(count, np.int8)
+        self.gameOver = np.zeros(count, np.int8)
+        # squares played in each game, -1 after the last one.  Passes aren't stored
+        self.moves = np.full((count, MAX_PLIES), -1, np.int8)
+        self.plies = np.zeros(count, np.int32)
+
+    def __len__(self):
+        return len(self.side)
+
+    # mask of the games still going
+    def active(self):
+        return self.gameOver < 2
+
+    # plays 1 move, or a pass, in every game that is still going.  policies is [white,
+    # black].  Returns the number of moves played
+    def step(self, policies, rng):
+        games = np.flatnonzero(self.active())
+        side = self.side[games]
+        own = self.boards[games, side]
+        other = self.boards[games, 1 - side]
+        moves = batch.moveBits(own, other)
+        canMove = moves != 0
+        # a pass, and 2 in a row end the game
+        passing = games[~canMove]
+        self.gameOver[passing] += 1
+        played = 0
+        for i in range(2):
+            # games where colour i moves
+            mine = canMove & (side == i)
+            if not mine.any():
+                continue
+            squares = np.asarray(policies[i](own[mine], other[mine], moves[mine], rng), np.int64)
+            bits = np.left_shift(np.uint64(1), squares.astype(np.uint64))
+            flips = flipBits(bits, own[mine], other[mine])
+            index = games[mine]
+            self.boards[index, i] = own[mine] | bits | flips
+            self.boards[index, 1 - i] = other[mine] ^ flips
+            self.moves[index, self.plies[index]] = squares
+            self.plies[index] += 1
+            self.gameOver[index] = 0
+            played += len(index)
+        self.side[games] = 1 - side
+        # a wiped out colour or a full board ends it straight away, as in main
+        counts = batch.popCounts(self.boards[games])
+        over = (counts[:, 0] == 0) | (counts[:, 1] == 0) | (counts.sum(axis=1) == 64)
+        self.gameOver[games[over]] = 2
+        return played
+
+    # plays every game to the end.  Returns the number of moves played
+    def play(self, policies, rng):
+        played = 0
+        while self.active().any():
+            played += self.step(policies, rng)
+        return played
+
+    # (N, 2) [white, black] piece counts
+    def score(self):
+        return batch.discCounts(self.boards)
+
+    # GameRecord of game i
+    def record(self, i):
+        return records.GameRecord([int(sq) for sq in self.moves[i, :self.plies[i]]], engine.popCount(int(self.boards[i, 1])))
+
+# plays count games between the policies, [white, black], a batch at a time.  Returns
+# (wins for [white, black], draws, moves played, Games of each batch)
+def playMatch(count, policies, batchSize, seed=None):
+    rng = np.random.default_rng(seed)
+    wins, draws, played = [0, 0], 0, 0
+    for start in range(0, count, batchSize):
+        games = Games(min(batchSize, count - start))
+        played += games.play(policies, rng)
+        score = games.score()
+        wins[0] += int((score[:, 0] > score[:, 1]).sum())
+        wins[1] += int((score[:, 1] > score[:, 0]).sum())
+        draws += int((score[:, 0] == score[:, 1]).sum())
+        yield wins, draws, played, games
+
+def main():
+    parser = argparse.ArgumentParser(description="Othello self-play matches with NumPy")
+    parser.add_argument("--games", type=int, default=10000, help="number of games (default 10000)")
+    parser.add_argument("--black", choices=sorted(POLICIES), default="greedy", help="black's policy (default greedy)")
+    parser.add_argument("--white", choices=sorted(POLICIES), default="random", help="white's policy (default random)")
+    parser.add_argument("--batch", type=int, default=10000, help="games played at once (default 10000)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--output", default=None, help="file to write the games to, .wtb or text like f5d6c3")
+    options = parser.parse_args()
+
+    policies = [POLICIES[options.white], POLICIES[options.black]]
+    out = records.GameWriter(options.output) if options.output else None
+    wins, draws, played = [0, 0], 0, 0
+    startTime = time.time()
+    for wins, draws, played, games in playMatch(options.games, policies, options.batch, options.seed):
+        if out:
+            for i in range(len(games)):
+                out.write(games.record(i))
+    seconds = time.time() - startTime
+    if out:
+        out.close()
+    print("{} games: black ({}) {} wins, white ({}) {} wins, {} draws".format(
+        options.games, options.black, wins[1], options.white, wins[0], draws))
+    print("{} moves in {:.2f}s, {:.0f} moves a second".format(played, seconds, played / seconds if seconds else 0))
+
+if __name__ == "__main__":
+    main()
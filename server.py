@@ -0,0 +1,295 @@
+"""
+Othello engine server.  Reads commands a line at a time, GTP style, and answers each
+with "=[id] result" or "?[id] error" followed by a blank line.  A line can start with a
+number, the id, which is repeated in its answer.  Commands are read and started as they
+arrive, so a client can send many and take the answers as they are ready, which is not
+always in the order they were sent; use ids to match them up.
+
+    [id] analyse POSITION [depth N] [time SECONDS] [top K]
+        POSITION is "start", "moves f5d6c3" (from the start) or "board BOARD X|O" where
+        BOARD is the 64 squares a1 b1 .. h8 as X, O and . or -, and X|O is the colour to
+        move.  The answer is "move e6 score 4 depth 8 nodes 1234 pv e6 f4 pass c3", with
+        "solved" after the depth when the score is the exact final result.  With top the
+        answer has a line like that for each of the best K moves, best first
+    [id] stats        positions analysed, positions a second and table hit rate so far
+    [id] name, version, protocol_version, list_commands, known_command NAME
+    [id] quit         answers once every command before it is answered, and stops
+
+Searches run on a pool of --workers processes, each with its own Search but all sharing 1
+transposition table, so what one request learns the next can use.  The table is shared
+memory that forked workers inherit; where workers can't be forked each has its own.
+
+    python server.py --workers 4 --depth 8
+    python server.py --port 5000
+"""
+
+import sys
+import time
+import engine
+from pattern import WEIGHTS_DEFAULT_FILE, loadEvaluator
+
+SERVER_NAME         = "Python Othello"
+SERVER_VERSION      = "1.5"
+PROTOCOL_VERSION    = 1
+SERVER_DEPTH        = 6 # plies searched when a request doesn't say
+COMMANDS            = ["analyse", "known_command", "list_commands", "name", "protocol_version", "quit", "stats", "version"]
+
+# raised for a command that can't be answered, with the message to send back
+class CommandError(Exception):
+    pass
+
+# (board, colour index to move) from the words of a position, "start", "moves f5d6" or
+# "board BOARD X"
+def parsePosition(words):
+    if not words:
+        raise CommandError("missing position")
+    kind, words = words[0], words[1:]
+    if kind == "start":
+        return [engine.START_WHITE, engine.START_BLACK], 1, words
+    if kind == "moves":
+        position = engine.Position()
+        moves = words[0] if words and words[0] not in ("depth", "time", "top") else ""
+        try:
+            position.playMoves(moves)
+        except ValueError as e:
+            raise CommandError(str(e))
+        return position.board, engine.colourIndex(position.colour), words[1 if moves else 0:]
+    if kind == "board":
+        if len(words) < 2 or len(words[0]) != 64 or words[1].upper() not in (engine.BLACK, engine.WHITE):
+            raise CommandError("board needs 64 squares and X or O to move")
+        board = [0, 0]
+        for sq, c in enumerate(words[0].upper()):
+            if c in (engine.WHITE, engine.BLACK):
+                board[engine.colourIndex(c)] |= 1 << sq
+            elif c not in ".-":
+                raise CommandError("{!r} is not X, O, . or -".format(c))
+        return board, engine.colourIndex(words[1].upper()), words[2:]
+    raise CommandError("unknown position {!r}".format(kind))
+
+# {"depth": plies, "time": seconds, "top": moves} from the words after a position
+def parseLimits(words, depth):
+    limits = {"depth": depth, "time": 0, "top": 1}
+    if len(words) % 2:
+        raise CommandError("limits come in pairs, like depth 8")
+    for name, value in zip(words[::2], words[1::2]):
+        if name not in limits:
+            raise CommandError("unknown limit {!r}".format(name))
+        try:
+            limits[name] = float(value) if name == "time" else int(value)
+        except ValueError:
+            raise CommandError("{} needs a number".format(name))
+    if not 1 <= limits["depth"] <= 60:
+        raise CommandError("depth must be 1 to 60")
+    if limits["top"] < 1:
+        raise CommandError("top must be 1 or more")
+    return limits
+
+# the square names of a line of play, "pass" for a pass
+def moveNames(line):
+    return " ".join("pass" if sq == engine.NO_MOVE else engine.squareName(sq >> 3, sq & 7) for sq in line)
+
+# the Search a pool worker process analyses positions with
+workerSearch = None
+
+# sets up a pool worker.  table is the server's transposition table, shared by forked
+# workers, or None for a worker that can't share it to make its own of ttMb
+def initWorker(table, ttMb, evaluator, endgameEmpties):
+    global workerSearch
+    workerSearch = engine.Search(1, endgameEmpties=endgameEmpties)
+    workerSearch.table = table if table is not None else engine.TranspositionTable(ttMb)
+    workerSearch.evaluator = evaluator
+
+# searches board with colour index side to move for the best count moves in a pool worker.
+# Returns (answer text, nodes, table probes, table hits)
+def analysePosition(board, side, depth, breadth, timeLimit, count):
+    search = workerSearch
+    probes, hits = search.table.probes, search.table.hits
+    if count > 1:
+        lines = search.analyse(board, side, count, depth, breadth, timeLimit)[:count]
+    else:
+        result = search.run(board, side, depth, breadth, timeLimit)
+        lines = []
+        if result is not None:
+            score, sq, flips = result
+            after = list(board)
+            after[side] |= (1 << sq) | flips
+            after[1 - side] ^= flips
+            lines.append((score, sq, flips, True, [sq] + search.principalVariation(after, 1 - side, engine.PV_LENGTH - 1)))
+    text = "move pass"
+    if lines:
+        text = "\n".join("move {} score {} depth {}{} nodes {} pv {}".format(
+            engine.squareName(sq >> 3, sq & 7), score, search.depth, " solved" if search.solved else "", search.nodes, moveNames(line))
+            for score, sq, flips, exact, line in lines)
+    return text, search.nodes, search.table.probes - probes, search.table.hits - hits
+
+# the searches of a pool of worker processes sharing 1 transposition table
+class Analyser:
+    def __init__(self, workers, ttMb, breadth, evaluator=None, endgameEmpties=engine.ENDGAME_EMPTIES):
+        import multiprocessing
+        import concurrent.futures
+        self.table = engine.TranspositionTable(ttMb)
+        self.breadth = breadth
+        # forked workers inherit the table's memory map, so they all use the same one.  It
+        # can't be pickled for workers started any other way
+        context, table = None, None
+        if "fork" in multiprocessing.get_all_start_methods():
+            context, table = multiprocessing.get_context("fork"), self.table
+        self.pool = concurrent.futures.ProcessPoolExecutor(workers, mp_context=context, initializer=initWorker,
+                                                           initargs=(table, ttMb, evaluator, endgameEmpties))
+        self.positions = self.nodes = self.probes = self.hits = 0
+        self.start = time.time()
+
+    def close(self):
+        self.pool.shutdown()
+
+    # the answer text for board with colour index side to move, searched in the pool
+    async def analyse(self, board, side, depth, timeLimit, count):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        text, nodes, probes, hits = await loop.run_in_executor(self.pool, analysePosition,
+                                                               board, side, depth, self.breadth, timeLimit, count)
+        self.positions += 1
+        self.nodes += nodes
+        self.probes += probes
+        self.hits += hits
+        return text
+
+    def stats(self):
+        seconds = time.time() - self.start
+        return "positions {} seconds {:.2f} positionsPerSecond {:.2f} nodes {} ttHitRate {:.4f}".format(
+            self.positions, seconds, self.positions / seconds if seconds else 0, self.nodes,
+            self.hits / self.probes if self.probes else 0)
+
+# a client: its commands are started as they arrive and answered through write
+class Session:
+    def __init__(self, analyser, write, depth):
+        self.analyser = analyser
+        self.write = write
+        self.depth = depth
+        self.pending = set()
+
+    def answer(self, id, text, ok=True):
+        self.write("{}{} {}\n\n".format("=" if ok else "?", id, text).replace(" \n", "\n"))
+
+    # answers 1 line.  Returns False for quit
+    async def command(self, line):
+        import asyncio
+        words = line.split()
+        id = ""
+        if words and words[0].isdigit():
+            id, words = words[0], words[1:]
+        if not words:
+            return True
+        name, args = words[0], words[1:]
+        try:
+            if name == "analyse":
+                board, side, rest = parsePosition(args)
+                limits = parseLimits(rest, self.depth)
+                task = asyncio.ensure_future(self.analyse(id, board, side, limits))
+                self.pending.add(task)
+                task.add_done_callback(self.pending.discard)
+            elif name == "quit":
+                await self.finish()
+                self.answer(id, "")
+                return False
+            elif name == "stats":
+                self.answer(id, self.analyser.stats())
+            elif name == "name":
+                self.answer(id, SERVER_NAME)
+            elif name == "version":
+                self.answer(id, SERVER_VERSION)
+            elif name == "protocol_version":
+                self.answer(id, PROTOCOL_VERSION)
+            elif name == "list_commands":
+                self.answer(id, "\n".join(COMMANDS))
+            elif name == "known_command":
+                self.answer(id, "true" if args and args[0] in COMMANDS else "false")
+            else:
+                raise CommandError("unknown command")
+        except CommandError as e:
+            self.answer(id, str(e), False)
+        return True
+
+    async def analyse(self, id, board, side, limits):
+        self.answer(id, await self.analyser.analyse(board, side, limits["depth"], limits["time"], limits["top"]))
+
+    # waits for every command started to be answered
+    async def finish(self):
+        import asyncio
+        if self.pending:
+            await asyncio.wait(list(self.pending))
+
+    # answers lines from reader until it ends or says quit
+    async def serve(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not await self.command(line.decode("utf-8", "replace")):
+                return
+        await self.finish()
+
+# serves stdin and stdout
+async def serveStdio(analyser, depth):
+    import asyncio
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def _write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    await Session(analyser, _write, depth).serve(reader)
+
+# serves every connection to host:port, until the process is stopped
+async def serveTcp(analyser, depth, host, port):
+    import asyncio
+
+    async def _client(reader, writer):
+        await Session(analyser, lambda text: writer.write(text.encode()), depth).serve(reader)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(_client, host, port)
+    async with server:
+        await server.serve_forever()
+
+def main():
+    import asyncio
+    import argparse
+    parser = argparse.ArgumentParser(description="Othello engine server, line by line on stdin/stdout or TCP")
+    parser.add_argument("--workers", type=int, default=1, help="processes searching at once (default 1)")
+    parser.add_argument("--depth", type=int, default=SERVER_DEPTH,
+                        help="plies to search when a request doesn't say (default {})".format(SERVER_DEPTH))
+    parser.add_argument("--breadth", type=int, default=5, choices=range(6), help="AI Breadth setting (default 5)")
+    parser.add_argument("--tt-mb", type=int, default=engine.TT_DEFAULT_MB,
+                        help="shared transposition table MB (default {})".format(engine.TT_DEFAULT_MB))
+    parser.add_argument("--endgame", type=int, default=engine.ENDGAME_EMPTIES,
+                        help="empty squares left when searches solve the position (default {}, 0 never)".format(engine.ENDGAME_EMPTIES))
+    parser.add_argument("--weights", default=None,
+                        help="pattern evaluation weights made by pattern.py (default {} next to this file, if there is one)".format(WEIGHTS_DEFAULT_FILE))
+    parser.add_argument("--no-weights", action="store_true", help="count captured pieces instead of using pattern evaluation")
+    parser.add_argument("--port", type=int, default=None, help="serve TCP connections on this port instead of stdin/stdout")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on with --port (default 127.0.0.1)")
+    options = parser.parse_args()
+
+    try:
+        evaluator = loadEvaluator(options.weights, options.no_weights)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    analyser = Analyser(options.workers, options.tt_mb, options.breadth, evaluator, options.endgame)
+    try:
+        if options.port is not None:
+            asyncio.run(serveTcp(analyser, options.depth, options.host, options.port))
+        else:
+            asyncio.run(serveStdio(analyser, options.depth))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        analyser.close()
+    print(analyser.stats(), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()